@@ -7,4 +7,11 @@ Semantically parse a human readable schedule.
 version = '0.1'
 
 from .parsing import parse 
-from .dintspec import DateIntervalSpec
\ No newline at end of file
+from .dintspec import DateIntervalSpec
+from .compact import CompactSpec
+from .cycle import CycleTable
+from .parsecache import ParseCache, parse_cache, normalize_phrase
+from .vectorized import occurrence_mask, occurrences_between
+from .batch import parse_many
+from .scheduleset import ScheduleSet
+from .timeline import iter_timeline
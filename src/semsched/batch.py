@@ -0,0 +1,213 @@
+"""
+batch.py
+Parsing of large batches of phrases.
+
+The phrases are deduplicated on their normalized form (see
+parsecache.normalize_phrase()), the unique ones are parsed in chunks by a
+pool of worker processes and the results are returned in input order.
+
+The phrases are parsed directly, without compiling them or going through
+the shared parse cache, so a batch doesn't evict the cached phrases of the
+caller.
+
+The workers send back the filters as a tuple of small integers, with the
+day of week and day of month sets as bitmasks (see compact.py) when they are
+within range and the year indices as an IntervalSet, instead of pickled
+DateIntervalSpec instances.
+The specifications are rebuilt from these in the calling process.
+"""
+
+import os
+from .engine import _filter_names
+from .compact import CompactSpec, _to_mask, _from_mask
+from .dintspec import DateIntervalSpec
+from .parsecache import normalize_phrase
+
+# cached reference to the ProcessPoolExecutor class, False if it is not available
+_pool_class = None
+
+# limit on the default number of phrases per chunk
+_max_chunksize = 512
+
+# -------------------------------------------
+
+def _executor_class():
+    """
+    Internal function.
+    Import concurrent.futures on first use.
+
+    Return:
+        The ProcessPoolExecutor class or None if it isn't available.
+    """
+
+    global _pool_class
+    if _pool_class == None:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            _pool_class = ProcessPoolExecutor
+        except ImportError:
+            _pool_class = False
+
+    return _pool_class or None
+
+# -------------------------------------------
+
+def _pack( dint ):
+    """
+    Internal function.
+    Convert the filters of a specification to the transport tuple, in the
+    order of _filter_names.
+    """
+
+    fields = [ getattr(dint, name) for name in _filter_names ]
+    for i, lo, hi in ( (2, 0, 6), (3, 1, 31) ):
+        # out of range values are kept as the set
+        if fields[i] != None and all( lo <= x <= hi for x in fields[i] ):
+            fields[i] = _to_mask(fields[i], lo, hi)
+    return tuple(fields)
+
+# -------------------------------------------
+
+def _unpack( fields ):
+    """
+    Internal function.
+    Convert a transport tuple of _pack() back to a dict of the filters.
+    """
+
+    fields = list(fields)
+    for i, lo in ( (2, 0), (3, 1) ):
+        if not isinstance(fields[i], (set, frozenset)): fields[i] = _from_mask(fields[i], lo)
+    return dict( zip(_filter_names, fields) )
+
+# -------------------------------------------
+
+def _parse_chunk( phrases ):
+    """
+    Internal function.
+    Parse a chunk of normalized phrases, this runs in the worker processes.
+
+    Parameters:
+        phrases - list of normalized phrases
+
+    Return:
+        A list of ( True, filters of _pack() ) or ( False, exception ) in
+        the order of the phrases.
+    """
+
+    results = []
+    for phrase in phrases:
+        try:
+            results.append( (True, _pack( DateIntervalSpec(phrase) )) )
+        except Exception as e:
+            results.append( (False, e) )
+    return results
+
+# -------------------------------------------
+
+def _from_fields( fields, phrase ):
+    """
+    Internal function.
+    Build a DateIntervalSpec of a phrase from a transport tuple of _pack().
+    """
+
+    dint = DateIntervalSpec()
+    for name, value in _unpack(fields).items():
+        setattr(dint, name, value)
+    dint.phrase = phrase
+    return dint
+
+# -------------------------------------------
+
+def _chunks( values, chunksize ):
+    """
+    Internal function.
+    Split a list into consecutive lists of at most chunksize values.
+    """
+
+    return [ values[i:i + chunksize] for i in range(0, len(values), chunksize) ]
+
+# -------------------------------------------
+
+def parse_many( phrases, workers=None, chunksize=None, compact=False, executor=None ):
+    """
+    Parse many phrases, in parallel worker processes.
+
+    Parameters:
+        phrases   - iterable of human readable phrases
+        workers   - number of worker processes, 1 parses in this process
+                    (default=number of CPUs)
+        chunksize - number of unique phrases sent to a worker at once
+                    (default=spread the phrases in about 4 chunks per worker)
+        compact   - return CompactSpec instances instead of DateIntervalSpec
+                    instances (default=False)
+        executor  - existing concurrent.futures executor to use instead of
+                    starting a pool of workers (default=None)
+
+    Return:
+        A list with one result per phrase, in the same order. The result is
+        the parsed specification or, if the phrase couldn't be parsed, the
+        exception that was raised.
+
+    Notes:
+        * Phrases with the same normalized form are parsed once. Each
+          DateIntervalSpec result is a separate instance with its own phrase.
+        * The parsing falls back on this process if there is a single
+          worker, a single chunk or concurrent.futures is not available.
+    """
+
+    if workers == None: workers = os.cpu_count() if hasattr(os, 'cpu_count') else 1
+    workers = max(1, workers or 1)
+    if chunksize != None and chunksize < 1: raise ValueError('chunksize must be at least 1.')
+
+    # normalized form of each phrase, the errors are kept as the result
+    phrases = list(phrases)
+    keys = []
+    unique = {}
+    for phrase in phrases:
+        try:
+            key = normalize_phrase(phrase)
+        except Exception as e:
+            key = e
+        else:
+            unique.setdefault(key, len(unique))
+        keys.append(key)
+
+    unique = sorted(unique, key=unique.get)
+    if chunksize == None:
+        chunksize = min( _max_chunksize, max(1, -( -len(unique) // (4 * workers) )) )
+    chunks = _chunks(unique, chunksize)
+
+    # parse the unique phrases
+    if executor != None:
+        parsed = executor.map(_parse_chunk, chunks)
+    elif workers > 1 and len(chunks) > 1 and _executor_class() != None:
+        with _executor_class()( max_workers=min(workers, len(chunks)) ) as pool:
+            parsed = list( pool.map(_parse_chunk, chunks) )
+    else:
+        parsed = map(_parse_chunk, chunks)
+
+    specs = {}
+    for chunk, results in zip(chunks, parsed):
+        for key, (ok, value) in zip(chunk, results):
+            if ok and compact:
+                try:
+                    value = CompactSpec(**_unpack(value))
+                except Exception as e:
+                    value = e
+            specs[key] = value
+
+    # results in the input order
+    results = []
+    for phrase, key in zip(phrases, keys):
+        if isinstance(key, Exception):
+            results.append(key)
+            continue
+
+        spec = specs[key]
+        if not compact and isinstance(spec, tuple):
+            spec = _from_fields(spec, phrase)
+        results.append(spec)
+
+    return results
+
+# -------------------------------------------
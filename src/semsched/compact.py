@@ -0,0 +1,329 @@
+"""
+compact.py
+Compact immutable representation of a DateIntervalSpec.
+
+The set valued filters are stored as small integer bitmasks:
+    dow   - 7 bits, bit i set for day of week i (0 = Monday)
+    dom   - 31 bits, bit d-1 set for day of month d
+    month - 12 bits, bit m-1 set for month m, combining month_indx
+            and the month modulus
+
+The instances have no __dict__, can't be modified and are hashable, so they
+can be shared and used as dictionary keys. The phrase is not kept and the
+start_date only as the ordinal anchor of a day modulus, the other queries
+start from the current day unless dates are given. The year indices are kept
+as an IntervalSet.
+
+The compiled forms are not kept by the instances, they are shared through a
+bounded least recently used cache keyed on the filters, so the instances
+with the same filters use a single compiled form.
+"""
+
+import datetime
+from collections import OrderedDict
+from .engine import _CompiledSpec, _filter_names
+from .queries import IntervalQueries
+from .intervals import IntervalSet
+
+try:
+    from _thread import allocate_lock
+except ImportError:
+    from thread import allocate_lock
+
+# all bits of the month mask
+_all_months = ( 1 << 12 ) - 1
+
+# compiled forms shared by the instances, filter key --> _CompiledSpec
+_compiled_forms = OrderedDict()
+_compiled_lock = allocate_lock()
+
+# number of compiled forms kept, the least recently used are dropped
+_max_compiled = 1024
+
+# -------------------------------------------
+
+def _to_mask( values, lo, hi ):
+    """
+    Internal function.
+    Convert a set of integers within lo <= x <= hi to a bitmask, None is kept.
+    """
+
+    if values == None: return None
+
+    mask = 0
+    for x in values:
+        if x < lo or x > hi:
+            raise ValueError('Filter value %i is outside of %i - %i.' % (x, lo, hi))
+        mask |= 1 << ( x - lo )
+    return mask
+
+# -------------------------------------------
+
+def _from_mask( mask, lo ):
+    """
+    Internal function.
+    Convert a bitmask back to a frozenset of integers, None is kept.
+    """
+
+    if mask == None: return None
+
+    values = []
+    x = lo
+    while mask:
+        if mask & 1: values.append(x)
+        mask >>= 1
+        x += 1
+    return frozenset(values)
+
+# -------------------------------------------
+
+def _month_mask( month_indx, month_mod, month_mod_val ):
+    """
+    Internal function.
+    Combine the month filters into a 12 bit mask, None when every month passes.
+    """
+
+    if month_indx == None and month_mod == None: return None
+
+    mask = 0
+    for m in range(1, 13):
+        if month_indx != None and m != month_indx: continue
+        if month_mod != None and m % month_mod != month_mod_val: continue
+        mask |= 1 << ( m - 1 )
+
+    if mask == _all_months: return None
+    return mask
+
+# -------------------------------------------
+
+def _month_filters( mask ):
+    """
+    Internal function.
+    Convert a 12 bit month mask back to (month_indx, month_mod, month_mod_val).
+
+    Notes:
+        * Masks built by _month_mask() are either empty, a single month or
+          a modulus pattern. The empty mask becomes a modulus of 13 since
+          no month passes it.
+    """
+
+    if mask == None: return (None, None, 0)
+    if mask == 0: return (None, 13, 0)
+    if mask & ( mask - 1 ) == 0: return (mask.bit_length(), None, 0)
+
+    for mod in range(2, 13):
+        for val in range(mod):
+            if _month_mask(None, mod, val) == mask: return (None, mod, val)
+
+    raise ValueError('Month mask %i is not a month filter.' % mask)
+
+# -------------------------------------------
+
+def _anchor( day_mod, start_date ):
+    """
+    Internal function.
+    Obtain the ordinal anchor of the day modulus, None when the day modulus
+    passes every count and the anchor doesn't matter.
+    """
+
+    if day_mod == None or day_mod == 1: return None
+    if start_date == None: start_date = datetime.date.today()
+    return start_date.toordinal()
+
+# -------------------------------------------
+
+def _compiled_form( spec ):
+    """
+    Internal function.
+    Obtain the shared compiled form of the filters of a CompactSpec,
+    compiling it on a miss.
+    """
+
+    key = spec._filter_key()
+
+    with _compiled_lock:
+        compiled = _compiled_forms.get(key)
+        if compiled != None:
+            _compiled_forms[key] = _compiled_forms.pop(key)
+            return compiled
+
+    # compiled without holding the lock, the first one stored is kept
+    compiled = _CompiledSpec(spec)
+
+    with _compiled_lock:
+        compiled = _compiled_forms.setdefault(key, compiled)
+        while len(_compiled_forms) > _max_compiled:
+            _compiled_forms.popitem(last=False)
+
+    return compiled
+
+# -------------------------------------------
+
+class CompactSpec(IntervalQueries):
+    """
+    Compact, immutable and hashable date interval specification with the
+    same filters and queries as DateIntervalSpec.
+
+    For example:
+        CompactSpec.from_phrase('every monday and friday') --> dow_mask = 0b10001
+        CompactSpec(dow={0}, month_indx=2)                 --> month_mask = 0b10
+
+    Notes:
+        * The start_date is kept as the ordinal anchor only when there is a
+          day modulus other than 1, it defaults to the day of creation as
+          for DateIntervalSpec. Without an anchor start_date is the current
+          day.
+    """
+    __slots__ = ( 'day_mod', 'day_mod_val', 'dow_mask', 'dom_mask', 'week_indx', 'month_mask',
+                  'year_mod', 'year_mod_val', 'year_indx', 'anchor' )
+
+    def __init__(self, day_mod=None, day_mod_val=0, dow=None, dom=None, week_indx=None,
+                 month_mod=None, month_mod_val=0, month_indx=None,
+                 year_mod=None, year_mod_val=0, year_indx=None, start_date=None):
+        if year_indx != None and not isinstance(year_indx, IntervalSet): 
+            year_indx = IntervalSet(year_indx)
+
+        _set = object.__setattr__
+        _set(self, 'day_mod', day_mod)
+        _set(self, 'day_mod_val', day_mod_val)
+        _set(self, 'dow_mask', _to_mask(dow, 0, 6))
+        _set(self, 'dom_mask', _to_mask(dom, 1, 31))
+        _set(self, 'week_indx', week_indx)
+        _set(self, 'month_mask', _month_mask(month_indx, month_mod, month_mod_val))
+        _set(self, 'year_mod', year_mod)
+        _set(self, 'year_mod_val', year_mod_val)
+        _set(self, 'year_indx', year_indx)
+        _set(self, 'anchor', _anchor(day_mod, start_date))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CompactSpec is immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError('CompactSpec is immutable.')
+
+    @classmethod
+    def from_spec(cls, dint):
+        """
+        Convert a DateIntervalSpec compatible instance, the phrase is dropped
+        and the start_date is kept as the anchor of the day modulus.
+        """
+
+        fields = dict( (name, getattr(dint, name)) for name in _filter_names )
+        return cls( start_date=getattr(dint, 'start_date', None), **fields )
+
+    @classmethod
+    def from_phrase(cls, phrase):
+        """
+        Parse a phrase through the shared parse cache, see parsecache.py.
+        """
+
+        from .parsecache import parse_cache
+        return cls.from_spec( parse_cache.get(phrase) )
+
+    def to_spec(self, start_date=None):
+        """
+        Convert to an equivalent DateIntervalSpec.
+
+        Parameters:
+            start_date - start date of the result (default=the anchor or today)
+
+        Return:
+            A new DateIntervalSpec instance with the same filters.
+        """
+
+        from .dintspec import DateIntervalSpec
+        dint = DateIntervalSpec()
+        for name in _filter_names:
+            setattr(dint, name, getattr(self, name))
+        if start_date == None and self.anchor != None: start_date = self.start_date
+        if start_date != None: dint.start_date = start_date
+        return dint
+
+    # ---------------------------
+
+    def _filter_key(self):
+        return ( self.day_mod, self.day_mod_val, self.dow_mask, self.dom_mask, self.week_indx,
+                 self.month_mask, self.year_mod, self.year_mod_val, self.year_indx )
+
+    def _key(self):
+        return self._filter_key() + ( self.anchor, )
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactSpec): return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented: return result
+        return not result
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return ( _restore, self._key() )
+
+    def __repr__(self):
+        values = [ getattr(self, name) for name in _filter_names ]
+        values.append( self.start_date if self.anchor != None else None )
+        return ( 'CompactSpec(day_mod=%r, day_mod_val=%r, dow=%r, dom=%r, week_indx=%r, '
+                 'month_mod=%r, month_mod_val=%r, month_indx=%r, year_mod=%r, year_mod_val=%r, '
+                 'year_indx=%r, start_date=%r)' % tuple(values) )
+
+    # ---------------------------
+    # DateIntervalSpec compatible filter attributes
+
+    @property
+    def dow(self):
+        return _from_mask(self.dow_mask, 0)
+
+    @property
+    def dom(self):
+        return _from_mask(self.dom_mask, 1)
+
+    @property
+    def month_indx(self):
+        return _month_filters(self.month_mask)[0]
+
+    @property
+    def month_mod(self):
+        return _month_filters(self.month_mask)[1]
+
+    @property
+    def month_mod_val(self):
+        return _month_filters(self.month_mask)[2]
+
+    @property
+    def start_date(self):
+        if self.anchor == None: return datetime.date.today()
+        return datetime.date.fromordinal(self.anchor)
+
+    # ---------------------------
+
+    def compile(self):
+        """
+        Compile the filters into the form used by the search engine, see
+        DateIntervalSpec.compile(). The result is shared with the other
+        instances of the same filters rather than kept by the instance.
+        """
+
+        return _compiled_form(self)
+
+# -------------------------------------------
+
+def _restore( day_mod, day_mod_val, dow_mask, dom_mask, week_indx, month_mask,
+              year_mod, year_mod_val, year_indx, anchor ):
+    """
+    Internal function.
+    Rebuild a CompactSpec from its fields, used by pickle.
+    """
+
+    self = CompactSpec.__new__(CompactSpec)
+    _set = object.__setattr__
+    for name, value in zip( CompactSpec.__slots__,
+                            ( day_mod, day_mod_val, dow_mask, dom_mask, week_indx, month_mask,
+                              year_mod, year_mod_val, year_indx, anchor ) ):
+        _set(self, name, value)
+    return self
+
+# -------------------------------------------
@@ -0,0 +1,217 @@
+"""
+cycle.py
+Precompiled cycle representation of a DateIntervalSpec.
+
+Without year indices, the year, month and day filters repeat with the
+146097 day (400 year) Gregorian cycle, or every lcm(400, year_mod) years
+with a year modulus. The matching days of a single period are stored as a
+compact sorted array of day offsets. Queries are then answered by bisection
+and modular arithmetic, with no scanning.
+"""
+
+import datetime, bisect
+from array import array
+from .engine import _forward, _period_years, _day_mod_match, _day_mod_count, _day_mod_index
+
+# limit on the length of a period, in years
+_max_period_years = 4000
+
+# -------------------------------------------
+
+class CycleTable(object):
+    """
+    Cycle table of a date interval specification, the sorted offsets of the
+    matching days within one period starting on Jan 1st of year 1.
+
+    The table is a snapshot, later changes to the specification are not
+    reflected. This is intended for long-lived specifications which are
+    queried very often.
+
+    For example:
+        "every monday"  --> period of 400 years, 20871 offsets
+        "every 3 years" --> period of 1200 years
+    """
+    def __init__(self, dint):
+        if dint.year_indx != None:
+            raise ValueError('Specifications with year indices do not repeat.')
+
+        self.period_years = _period_years(dint)
+        if self.period_years > _max_period_years:
+            raise ValueError('Period of %i years is too long to tabulate.' % self.period_years)
+
+        # 400 years is 146097 days
+        self.period_days = 146097 * ( self.period_years // 400 )
+
+        # day modulus configuration, used when evaluating the phase
+        compiled = dint.compile()
+        self.day_mod     = compiled.day_mod
+        self.day_mod_val = compiled.day_mod_val
+        self.dow         = compiled.dow
+        self.start_date  = dint.start_date
+
+        # ordinal 1 is the first day of the period
+        self.offsets = array('i', ( o - 1 for o in _forward(compiled, 0, self.period_days) ))
+
+    # ---------------------------
+
+    def __len__(self):
+        return len(self.offsets)
+
+    # ---------------------------
+
+    def _prefix(self, o):
+        """
+        Internal function.
+        Count the matching days up to and including the given ordinal.
+        """
+
+        k, offset = divmod(o - 1, self.period_days)
+        return k * len(self.offsets) + bisect.bisect_right(self.offsets, offset)
+
+    # ---------------------------
+
+    def _ordinal(self, i):
+        """
+        Internal function.
+        Obtain the ordinal of the i-th matching day, counted as in _prefix().
+        """
+
+        k, j = divmod(i - 1, len(self.offsets))
+        return k * self.period_days + self.offsets[j] + 1
+
+    # ---------------------------
+
+    def _date(self, o, start_ord, end_ord):
+        """
+        Internal function.
+        Convert an ordinal within start_ord < o <= end_ord to a date, otherwise None.
+        """
+
+        if o <= start_ord or o > end_ord: return None
+        return datetime.date.fromordinal(o)
+
+    # ---------------------------
+
+    def nth(self, n, start_date=None, end_date=None):
+        """
+        Obtain the n-th next occurance.
+
+        Parameters:
+            n          - index of the occurance, 1 is the next occurance.
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            the n-th next occurance in the given range or None.
+        """
+
+        if end_date == None: end_date = datetime.date(9999,1,1)
+        if start_date == None: start_date = self.start_date
+        if len(self.offsets) < 1: return None
+
+        result_cnt = _day_mod_index(self, n)
+        if result_cnt == None: return None
+
+        start_ord, end_ord = start_date.toordinal(), end_date.toordinal()
+        o = self._ordinal( self._prefix(start_ord) + result_cnt )
+        return self._date(o, start_ord, end_ord)
+
+    # ---------------------------
+
+    def next(self, start_date=None, end_date=None):
+        """
+        Obtain the next occurance in the given date range.
+
+        Parameters:
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            the next occurance in the given range or None if one didn't occur in the range.
+        """
+
+        return self.nth(1, start_date=start_date, end_date=end_date)
+
+    # ---------------------------
+
+    def previous(self, start_date=None, end_date=None):
+        """
+        Obtain the previous occurance in the given date range.
+
+        Parameters:
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            the previous occurance in the given range or None if one didn't occur in the range.
+        """
+
+        if end_date == None:
+            end_date = min( datetime.date.today(), self.start_date )
+        if start_date == None: start_date = datetime.date(2,1,1)
+        if len(self.offsets) < 1: return None
+
+        # the first count passing the day modulus, searching backwards
+        size = 1 if self.dow == None else len(self.dow)
+        limit = ( 2 * (self.day_mod or 1) + 1 ) * size
+        result_cnt = 1
+        while not _day_mod_match(self, result_cnt, reverse=True):
+            result_cnt += 1
+            if result_cnt > limit: return None
+
+        start_ord, end_ord = start_date.toordinal(), end_date.toordinal()
+        o = self._ordinal( self._prefix(end_ord - 1) - result_cnt + 1 )
+        return self._date(o, start_ord, end_ord - 1)
+
+    # ---------------------------
+
+    def count(self, start_date=None, end_date=None):
+        """
+        Count the occurances in the given date range.
+
+        Parameters:
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            The number of occurances in the range (int).
+        """
+
+        if end_date == None: end_date = datetime.date(9999,1,1)
+        if start_date == None: start_date = self.start_date
+        if end_date <= start_date: return 0
+
+        result_cnt = self._prefix(end_date.toordinal()) - self._prefix(start_date.toordinal())
+        return _day_mod_count(self, result_cnt)
+
+    # ---------------------------
+
+    def contains(self, date):
+        """
+        Test if the given date is an occurance, see DateIntervalSpec.contains().
+
+        Parameters:
+            date - the date to test
+
+        Return:
+            True if the date is an occurance.
+        """
+
+        o = date.toordinal()
+        offset = ( o - 1 ) % self.period_days
+        i = bisect.bisect_left(self.offsets, offset)
+        if i >= len(self.offsets) or self.offsets[i] != offset: return False
+
+        if self.day_mod == None: return True
+
+        # day modulus phase relative to the anchor
+        anchor = self.start_date.toordinal()
+        if o >= anchor:
+            return _day_mod_match(self, self._prefix(o) - self._prefix(anchor))
+        else:
+            return _day_mod_match(self, self._prefix(anchor - 1) - self._prefix(o - 1), reverse=True)
+
+    def __contains__(self, date):
+        return self.contains(date)
+
+# -------------------------------------------
@@ -4,20 +4,130 @@ defs.py
 Defintions used for parsing and related helper functions.
 """
 
-import re
+# --------------------------------------------------------------
+
+class _AliasSet(set):
+    """
+    Internal class.
+    Set of aliases of a single key, changes are reported to the owning 
+    _AliasMap so its reverse index is rebuilt.
+    """
+    __slots__ = ('_owner',)
+
+    def __init__(self, values=(), owner=None):
+        set.__init__(self, values)
+        self._owner = owner
+
+    def _changed(self):
+        if self._owner != None: self._owner._changed()
+
+# wrap the set methods which modify the set in place
+def _alias_set_mutator(name):
+    method = getattr(set, name)
+    def _mutator(self, *args):
+        result = method(self, *args)
+        self._changed()
+        return result
+    _mutator.__name__ = name
+    return _mutator
+
+for _name in ( 'add', 'discard', 'remove', 'pop', 'clear', 'update', 'difference_update', 
+               'intersection_update', 'symmetric_difference_update', 
+               '__ior__', '__iand__', '__isub__', '__ixor__' ):
+    setattr(_AliasSet, _name, _alias_set_mutator(_name))
+
+# --------------------------------------------------------------
+
+class _AliasMap(dict):
+    """
+    Internal class.
+    Alias map of key --> alias set, keeping a reverse index of alias --> key 
+    for _spec_alias_lookup(). Any change to the map or to one of its alias 
+    sets increments the version and the index is rebuilt on the next lookup.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self)
+        self.version = 0
+        self._index = None
+        self.update(*args, **kwargs)
+
+    def _changed(self):
+        self.version += 1
+        self._index = None
+
+    def __setitem__(self, key, aliases):
+        dict.__setitem__(self, key, _AliasSet(aliases, owner=self))
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        for key, aliases in dict(*args, **kwargs).items():
+            self[key] = aliases
+
+    def setdefault(self, key, aliases=()):
+        if key not in self: self[key] = aliases
+        return self[key]
+
+    def pop(self, *args):
+        result = dict.pop(self, *args)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = dict.popitem(self)
+        self._changed()
+        return result
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def lookup(self, alias):
+        """
+        Obtain the key of an alias or its pluralized version, see _spec_alias_lookup().
+        """
+
+        # a local reference, the index may be dropped by another thread
+        current = self._index
+        if current == None:
+            # first key (in order) of every alias and the position of the keys
+            index, position = {}, {}
+            for i, (k, curset) in enumerate(list(self.items())):
+                position[k] = i
+                for x in curset: index.setdefault(x, k)
+            current = self._index = (index, position)
+
+        index, position = current
+        exact = index.get(alias)
+        plural = index.get(alias.rstrip('s'))
+
+        # the first key matching either way takes precedence
+        if exact == None: return plural
+        if plural == None or position[exact] <= position[plural]: return exact
+        return plural
+
+# --------------------------------------------------------------
 
 # define the modifiers which act on a given schedule group
 # map keywords to alias sets
-_modifiers = {
+_modifiers = _AliasMap({
     'every': {'every', 'each', 'all'},  # recurring
     'other': {'other',},                # "every other" (second, 2nd...) are already interpreted
     'odd':  {'odd'},                    # every odd instance 
     'even': {'even'},                   # every even instance
     'next': {'next'},
-}
+})
 
 # define day specifications
-_days = {
+_days = _AliasMap({
     'day':   {'day','daily'},
     'weekday': {'weekday'},
     'weekend': {'weekend'},
@@ -29,10 +139,10 @@ _days = {
     'fri':   {'f', 'fri', 'friday', },
     'sat':   {'s', 'sa', 'sat', 'saturday', },
     'sun':   {'u', 'su', 'sun', 'sunday', },   
-}
+})
 
 # define month specifications
-_months = {
+_months = _AliasMap({
     'month': {'month','monthly'}, 
     'jan': {'jan', 'january' },
     'feb': {'feb', 'febuary' },
@@ -46,7 +156,32 @@ _months = {
     'oct': {'oct','october'},
     'nov': {'nov','november'},
     'dec': {'dec','december'},
-}
+})
+
+# --------------------------------------------------------------
+
+def _alias_forms(d, plurals=2):
+    """
+    Internal function.
+    Obtain every accepted form of the aliases of an alias map, the same 
+    forms matched by the pattern of _make_pattern().
+
+    Parameters:
+        d       - the alias map/dict
+        plurals - If > 0, add 's' aliases to members greater than this value.
+
+    Return:
+        A dict of lowercase form --> canonical key.
+    """
+
+    forms = {}
+    for k, aliases in d.items():
+        for x in aliases:
+            x = x.lower()
+            forms.setdefault(x, k)
+            if plurals > 0 and len(x) > plurals:
+                forms.setdefault(x + 's', k)
+    return forms
 
 # --------------------------------------------------------------
 
@@ -64,6 +199,8 @@ def _make_pattern(d, exact_match=True, plurals=2):
         Compiled regex pattern.
     """
 
+    import re
+
     entries = []
     [ entries.extend([y for y in x]) for x in d.values() ]
     
@@ -97,6 +234,9 @@ def _spec_alias_lookup( defs, alias):
 
     if not isinstance(alias, type(u'a')): return None
     alias = alias.lower()
+
+    # alias maps keep a reverse index
+    if isinstance(defs, _AliasMap): return defs.lookup(alias)
     
     for k, curset in defs.items():
         # exact match
@@ -5,10 +5,14 @@ Defines the DateIntervalSpec class definition.
 
 import datetime
 from .parsing import parse as _parse
+from .engine import _CompiledSpec, _filter_names
+from .queries import IntervalQueries
+from .compact import CompactSpec
+from .parsecache import parse_cache as _parse_cache
 
 # -------------------------------------------
 
-class DateIntervalSpec():
+class DateIntervalSpec(IntervalQueries):
     """
     Date interval specification, representation of all required 
     modulus period, modules phases and indices for days, months
@@ -36,245 +40,84 @@ class DateIntervalSpec():
         self.year_indx        = None  # year index filter
         self.start_date       = datetime.date.today()   # effective start date of interval
         self.phrase           = ""
+        self._compiled        = None  # compiled filters, see compile()
         
         if phrase != None:
             self.phrase = phrase
         
-        _parse(self, phrase)
+            _parse(self, phrase)
+
+    def __setattr__(self, name, value):
+        # any assignment of the filters invalidates the compiled form, the
+        # set valued filters are kept as mutable sets
+        if name in _filter_names:
+            if type(value) is frozenset: value = set(value)
+            self.__dict__['_compiled'] = None
+        self.__dict__[name] = value
+
+    def __getstate__(self):
+        # the compiled form holds local functions, it is rebuilt on first use
+        state = dict(self.__dict__)
+        state['_compiled'] = None
+        return state
         
     @classmethod
     def from_phrase(cls, phrase):
-        self = cls(phrase)
-        return self
-    
-    # ---------------------------
-
-    def previous(self, start_date=None, end_date=None):
         """
-        Obtain the previous occurance in the given date range.
-
-        Parameters: 
-            start_date - the starting date range, all days prior are ignored.
-            end_date   - the ending date range, all days after are ignored.
-
-        Return:
-            the previous occurance in the given range or None if one didn't occur in the range.
-
-        Note: 
-            This is equivalent to running .previous_occurances with a max_result of 1
+        Parse a phrase through the shared parse cache, see parsecache.py. 
+        Phrases which only differ in spacing share the same parse result, 
+        which is the same as parsing the phrase directly.
         """
 
-        result_ar = self.previous_occurances(start_date=start_date, end_date=end_date, max_results=1)
-        if len(result_ar) > 0:
-            return result_ar[0]
-        else:
-            return None
-    
-    # ---------------------------
+        compiled = _parse_cache.get(phrase)
 
-    def previous_occurances(self, start_date=None, end_date=None, max_results=10):
-        """
-        Obtain the previous occurances that occur in the given date range.
+        self = cls()
+        for name in _filter_names:
+            setattr(self, name, getattr(compiled, name))
+        self.phrase = phrase
 
-        Parameters: 
-            start_date  - the starting date range, all days prior are ignored.
-            end_date    - the ending date range, all days after are ignored.
-            max_results - limit to number of results to find
-        
-        Return:
-            a list of previous occurances in the given range.
+        # the cached result is a snapshot of the same filters
+        self._compiled = compiled
+        return self
 
-        Note: 
-            This function essentially runs the next() method while iterating 
-            backwards in time. The modulus may not work perfectly here.
+    def to_compact(self):
+        """
+        Convert to a CompactSpec, an immutable and hashable copy of the 
+        filters using a fraction of the memory. The phrase and start_date 
+        are not kept.
         """
 
-        if end_date == None:
-            end_date = min( datetime.date.today(), self.start_date )
-        if start_date == None: start_date = datetime.date(2,1,1)
-
-        curdate = end_date
-
-        # narrow the search range
-        if self.year_indx != None:
-            _chk_min = datetime.date(min(self.year_indx), 1, 1)
-            _chk_min = _chk_min - datetime.timedelta(days=1)
-            _chk_max = datetime.date(max(self.year_indx), 12, 31)
-
-            # check if this happened in the future
-            if _chk_min > end_date: return []
-            
-            # we can skip ahead to the specified year
-            if curdate > _chk_max:
-                curdate = _chk_max
-
-            if start_date < _chk_min:
-                start_date = _chk_min
-        
-        # initialize the loop
-        result_cnt = 0
-        results = []
-
-        end_date = curdate - datetime.timedelta(days=1)
-        curdate = curdate - datetime.timedelta(days=1)
-        
-        # we temporary disable the day modulus filter so we can
-        # filter on this end. The math appears to be slightly off going
-        # backwards.
-        _d_mod = self.day_mod; self.day_mod = None
-
-        while len(results) < max_results:
-            curdate = curdate - datetime.timedelta(days=1)
-
-            if curdate < start_date: break
-            prevday = self.next(start_date=curdate, end_date=end_date)
-            if prevday == None: continue
-            end_date = prevday - datetime.timedelta(days=1)
-
-            result_cnt += 1
-
-            # day_mod is modulated on the resulting days
-            if _d_mod != None:
-                if self.dow == None:
-                    # no specific day
-                    if (result_cnt) % _d_mod != self.day_mod_val:
-                        continue
-                elif self.dow == {0,1,2,3,4,}:
-                    # weekday case
-                    if (result_cnt) % _d_mod != self.day_mod_val:
-                        continue  
-                else:
-                    # week / weekend
-                    repeat = int( (result_cnt - 1) / len(self.dow) )
-                    if (repeat + 1) % _d_mod != self.day_mod_val:
-                        continue
-            
-            results.append(prevday)
-
-        # restore day_mod value
-        self.day_mod = _d_mod
-
-        return results
+        return CompactSpec.from_spec(self)
 
-    # ----------------------------------------------------------------------
-    
-    def next(self, start_date=None, end_date=None):
+    def compile(self):
         """
-        Obtain the next occurance in the given date range.
-
-        Parameters: 
-            start_date - the starting date range, all days prior are ignored.
-            end_date   - the ending date range, all days after are ignored.
+        Compile the filters into the form used by the search engine: a 
+        predicate containing only the active filters with their values bound 
+        in, along with the satisfiability analysis and cached per month and 
+        per year results.
 
         Return:
-            the next occurance in the given range or None if one didn't occur in the range.
+            The compiled specification.
 
         Note: 
-            This is equivalent to running .next_occurances with a max_result of 1
-        """
-
-        result_ar = self.next_occurances(start_date=start_date, end_date=end_date, max_results=1)
-        if len(result_ar) > 0:
-            return result_ar[0]
-        else:
-            return None
-    
-    # ---------------------------
-
-    def next_occurances(self, start_date=None, end_date=None, max_results=10):
-        """
-        Obtain the next occurances that occur in the given date range.
-
-        Parameters: 
-            start_date  - the starting date range, all days prior are ignored.
-            end_date    - the ending date range, all days after are ignored.
-            max_results - limit to number of results to find
-        
-        Return:
-            a list of next occurances in the given range.
+            This is done automatically by the queries, the result is kept 
+            until one of the filter attributes is assigned or one of the 
+            set valued filters is changed in place. The queries don't 
+            modify the instance, each one works on a single compiled 
+            snapshot, so a specification can be queried from many threads 
+            at once. Changing the filters while it is queried isn't safe.
         """
 
-        if end_date == None: end_date = datetime.date(9999,1,1)
-        if start_date == None: start_date = self.start_date
-
-        # narrow the search range
-        if self.year_indx != None:
-            _chk_min = datetime.date(min(self.year_indx), self.month_indx if self.month_indx != None else 1, 1)
-            _chk_min = _chk_min - datetime.timedelta(days=1)
-            _chk_max = datetime.date(max(self.year_indx), 12, 31)
-
-            # check if this happened in the past
-            if start_date > _chk_max: return []
-                
-            # we can skip ahead to the specified month, year
-            if start_date < _chk_min:
-                start_date = _chk_min
-            
-            if end_date > _chk_max:
-                end_date = _chk_max
-        
-        # initialize the loop
-        curdate = start_date
-        result_cnt = 0
-        result = []
-
-        # main iteration
-        while ( len(result) < max_results ):
-            # always add a day
-            curdate = curdate + datetime.timedelta(days=1)
-            if curdate > end_date: break
-            week = int( (curdate.day - 1) / 7 )
-
-            # year filtering
-            if self.year_indx != None:
-                if curdate.year > max(self.year_indx):
-                    break
-                if not curdate.year in self.year_indx: continue
-            
-            if self.year_mod != None:
-                if (curdate.year % self.year_mod ) != self.year_mod_val: continue
-            
-            # month filtering
-            if self.month_indx != None:
-                if curdate.month != self.month_indx: continue
-
-            if self.month_mod != None:
-                if (curdate.month % self.month_mod) != self.month_mod_val: continue
-            
-            # day filtering
-            if self.dow != None:
-                if not curdate.weekday() in self.dow: continue
-            
-            if self.dom != None:
-                if not curdate.day in self.dom: continue
-            
-            if self.week_indx != None:
-                if week != self.week_indx: continue
-            
-            # we matched! 
-            result_cnt += 1
-            
-            # day_mod is a modulated on the resulting days
-            if self.day_mod != None:
-                if self.dow == None:
-                    # no specific day
-                    if (result_cnt) % self.day_mod != self.day_mod_val:
-                        continue
-                elif self.dow == {0,1,2,3,4,}:
-                    # weekday case
-                    if (result_cnt - 1) % self.day_mod != self.day_mod_val:
-                        continue       
-                else:
-                    # week / weekend
-                    repeat = int( (result_cnt - 1) / len(self.dow) )
-                    if repeat % self.day_mod != self.day_mod_val:
-                        continue
-                    # ignore the first match
-                    if repeat < 1 and self.day_mod > 1: continue  
-            
-            result.append(curdate)
-            #print(result_cnt, week, curdate)
-
-        return result
+        compiled = self._compiled
+        if compiled != None:
+            # the sets may have been changed in place, e.g. spec.dom.add(15)
+            dow, dom, years = self.dow, self.dom, self.year_indx
+            if ( ( dow != compiled.dow and isinstance(dow, set) ) or
+                 ( dom != compiled.dom and isinstance(dom, set) ) or
+                 ( years != compiled.year_indx and isinstance(years, set) ) ):
+                compiled = None
+        if compiled == None:
+            compiled = _CompiledSpec(self)
+            self._compiled = compiled
+        return compiled
 
-    # -------------------------------------------------
\ No newline at end of file
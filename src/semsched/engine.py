@@ -0,0 +1,1037 @@
+"""
+engine.py
+Occurance search engine used by DateIntervalSpec.
+
+Rather than stepping one day at a time and testing every filter on
+every day, the search is performed hierarchically:
+    year  - jump directly to the next year passing year_indx / year_mod
+    month - jump directly to the next month passing month_indx / month_mod
+    day   - only then generate the matching days of the selected month
+
+The search works on proleptic ordinals (date.toordinal()) with tables of
+the month boundaries of each year, date instances are only created for
+the days actually returned.
+"""
+
+import datetime, bisect
+from .intervals import IntervalSet
+
+# month boundary tables, year --> ordinals of the first day of each month
+# followed by the first day of the next year (13 entries)
+_month_tables = {}
+
+# days in each month of a common year
+_days_per_month = ( 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31 )
+
+# kinds of years (weekday of Jan 1st, length) in the 400 year Gregorian cycle
+# as ( first year of the kind, number of years of the kind ), this is the 
+# pre-compiled result of _generate_period_kinds() without a year modulus.
+# Otherwise, set this value to None and it will be generated on first use.
+_cycle_kinds = (
+    (1, 43), (2, 44), (3, 43), (4, 13), (5, 43), (6, 43), (8, 14), 
+    (9, 44), (10, 43), (12, 15), (16, 15), (20, 14), (24, 13), (28, 13),
+)
+
+# cache of the kinds of years of the periods with a year modulus
+_period_kinds_cache = {}
+
+# first year of the same kind of each year of the 400 year cycle, see _cycle_year_kind()
+_cycle_firsts = None
+
+# limit on the length of a period with cumulative year counts, in years
+_max_prefix_years = 4000
+
+# -------------------------------------------------
+
+def _month_table( year ):
+    """
+    Internal function.
+    Obtain the month boundary table of a given year.
+
+    Parameters:
+        year - the year of the table
+
+    Return:
+        A tuple of 13 ordinals, the first day of each month followed 
+        by the first day of the next year.
+    
+    Notes:
+        * This references and fills the _month_tables cache.
+    """
+
+    table = _month_tables.get(year)
+    if table != None: return table
+
+    # ordinal of Jan 1st, ordinal 1 is Jan 1st of year 1
+    y = year - 1
+    o = y * 365 + y // 4 - y // 100 + y // 400 + 1
+    leap = ( year % 4 == 0 and year % 100 != 0 ) or year % 400 == 0
+
+    table = [o]
+    for m in range(12):
+        o += _days_per_month[m]
+        if m == 1 and leap: o += 1
+        table.append(o)
+    
+    table = _month_tables[year] = tuple(table)
+    return table
+
+# -------------------------------------------------
+
+def _year_candidates( dint, first, last, reverse=False ):
+    """
+    Internal function.
+    Generate the years in the inclusive range [first, last] passing the year
+    filters (year_indx, year_mod).
+
+    Parameters:
+        dint    - compiled specification to evaluate (_CompiledSpec)
+        first   - first year of the search range
+        last    - last year of the search range
+        reverse - generate the years in descending order (default=False)
+
+    Return:
+        Generator of years (int).
+    """
+
+    first = max( first, datetime.MINYEAR )
+    last = min( last, datetime.MAXYEAR )
+
+    if dint.years != None:
+        # only the explicitly specified years are possible
+        for y in dint.years.irange(first, last, reverse=reverse):
+            if dint.year_mod != None:
+                if ( y % dint.year_mod ) != dint.year_mod_val: continue
+            yield y
+    elif dint.year_mod != None:
+        # skip ahead to the first year in phase and step by the period
+        if reverse:
+            y = last - ( last - dint.year_mod_val ) % dint.year_mod
+            step = -dint.year_mod
+        else:
+            y = first + ( dint.year_mod_val - first ) % dint.year_mod
+            step = dint.year_mod
+        if ( y % dint.year_mod ) != dint.year_mod_val: return
+        while first <= y <= last:
+            yield y
+            y += step
+    elif reverse:
+        for y in range( last, first - 1, -1 ):
+            yield y
+    else:
+        for y in range( first, last + 1 ):
+            yield y
+
+# -------------------------------------------------
+
+def _month_candidates( dint ):
+    """
+    Internal function.
+    Obtain the months passing the month filters (month_indx, month_mod).
+
+    Parameters:
+        dint  - compiled specification to evaluate (_CompiledSpec)
+
+    Return:
+        A list of month indices (1-12) in ascending order.
+    """
+
+    result = []
+    for m in range(1,13):
+        if dint.month_indx != None:
+            if m != dint.month_indx: continue
+        if dint.month_mod != None:
+            if ( m % dint.month_mod ) != dint.month_mod_val: continue
+        result.append(m)
+
+    return result
+
+# -------------------------------------------------
+
+def _day_candidates( dint, first_wd, ndays ):
+    """
+    Internal function.
+    Obtain the days of a month passing the day filters (dow, dom, week_indx).
+    The days are computed directly from the weekday of the first day of the
+    month rather than by testing each day, the week index uses the same 
+    week = (day - 1) / 7 rule as the original day by day filter.
+
+    Parameters:
+        dint     - compiled specification to evaluate (_CompiledSpec)
+        first_wd - day of the week of the first day of the month (0-6)
+        ndays    - number of days in the month
+
+    Return:
+        A list of matching days of the month in ascending order.
+
+    Notes:
+        * The result only depends on (first_wd, ndays), so there are at most
+          28 distinct results for a given specification.
+    """
+
+    # the week index narrows the range to a block of 7 days
+    lo, hi = 1, ndays
+    if dint.week_indx != None:
+        if dint.week_indx < 0: return []
+        lo = 7 * dint.week_indx + 1
+        hi = min( lo + 6, ndays )
+    
+    if dint.dow != None:
+        # first day in range with the given day of the week, then every 7 days
+        days = []
+        for k in dint.dow:
+            if k < 0 or k > 6: continue
+            d = lo + ( k - first_wd + 1 - lo ) % 7
+            days.extend( range(d, hi + 1, 7) )
+        days.sort()
+    else:
+        days = list( range(lo, hi + 1) )
+
+    if dint.dom != None:
+        days = [ d for d in days if d in dint.dom ]
+
+    return days
+
+# -------------------------------------------------
+
+def _month_days( dint, mstart, mend ):
+    """
+    Internal function.
+    Obtain the matching days of a month through the cache of _day_candidates().
+
+    Parameters:
+        dint   - compiled specification to evaluate (_CompiledSpec)
+        mstart - ordinal of the first day of the month
+        mend   - ordinal of the first day of the next month
+
+    Return:
+        A list of matching days of the month in ascending order.
+    """
+
+    # ordinal 1 was a Monday (0)
+    key = ( (mstart + 6) % 7, mend - mstart )
+    days = dint.cache.get(key)
+    if days == None:
+        days = dint.cache[key] = _day_candidates(dint, *key)
+    return days
+
+# -------------------------------------------------
+
+def _day_mod_match( dint, result_cnt, reverse=False ):
+    """
+    Internal function.
+    Apply the day modulus filter, which is modulated on the count of
+    matching days found so far in the search.
+
+    Parameters:
+        dint       - compiled specification to evaluate (_CompiledSpec)
+        result_cnt - the count of the current matching day (starts at 1)
+        reverse    - the count is taken while searching backwards in time (default=False)
+
+    Return:
+        True if the matching day passes the day modulus filter.
+    """
+
+    if dint.day_mod == None: return True
+
+    if reverse:
+        if dint.dow == None or dint.dow == {0,1,2,3,4,}:
+            # no specific day / weekday case
+            return (result_cnt) % dint.day_mod == dint.day_mod_val
+        
+        # week / weekend
+        repeat = int( (result_cnt - 1) / len(dint.dow) )
+        return (repeat + 1) % dint.day_mod == dint.day_mod_val
+
+    if dint.dow == None:
+        # no specific day
+        return (result_cnt) % dint.day_mod == dint.day_mod_val
+    elif dint.dow == {0,1,2,3,4,}:
+        # weekday case
+        return (result_cnt - 1) % dint.day_mod == dint.day_mod_val
+    else:
+        # week / weekend
+        repeat = int( (result_cnt - 1) / len(dint.dow) )
+        if repeat % dint.day_mod != dint.day_mod_val:
+            return False
+        # ignore the first match
+        if repeat < 1 and dint.day_mod > 1: return False
+        return True
+
+# -------------------------------------------------
+
+def _count_residues( lo, hi, mod, val ):
+    """
+    Internal function.
+    Count the integers x in the inclusive range [lo, hi] with x % mod == val.
+    """
+
+    if hi < lo or val < 0 or val >= mod: return 0
+    first = lo + ( val - lo ) % mod
+    if first > hi: return 0
+    return ( hi - first ) // mod + 1
+
+# -------------------------------------------------
+
+def _day_mod_count( dint, result_cnt ):
+    """
+    Internal function.
+    Count how many of the first result_cnt matching days of a forward
+    search pass the day modulus filter, without testing each one.
+
+    Parameters:
+        dint       - compiled specification to evaluate (_CompiledSpec)
+        result_cnt - number of matching days found by the search
+
+    Return:
+        Number of days passing the day modulus filter (int).
+
+    Notes:
+        * This is the arithmetic equivalent of counting the values 
+          1..result_cnt passing _day_mod_match().
+    """
+
+    if result_cnt < 1: return 0
+    if dint.day_mod == None: return result_cnt
+
+    if dint.dow == None:
+        # no specific day
+        return _count_residues(1, result_cnt, dint.day_mod, dint.day_mod_val)
+    elif dint.dow == {0,1,2,3,4,}:
+        # weekday case
+        return _count_residues(0, result_cnt - 1, dint.day_mod, dint.day_mod_val)
+    
+    # week / weekend, days are grouped in repeats of len(dow)
+    size = len(dint.dow)
+    last = ( result_cnt - 1 ) // size
+    first = 1 if dint.day_mod > 1 else 0
+
+    # complete repeats followed by the partial last repeat
+    total = size * _count_residues(first, last - 1, dint.day_mod, dint.day_mod_val)
+    if last >= first and ( last % dint.day_mod ) == dint.day_mod_val:
+        total += result_cnt - last * size
+    return total
+
+# -------------------------------------------------
+
+def _day_mod_index( dint, n ):
+    """
+    Internal function.
+    Find the count of matching days of a forward search at which the n-th
+    day passes the day modulus filter, this is the inverse of _day_mod_count().
+
+    Parameters:
+        dint - compiled specification to evaluate (_CompiledSpec)
+        n    - index of the day passing the day modulus filter (starts at 1)
+
+    Return:
+        The count of matching days (int) or None if it never happens.
+    """
+
+    if n < 1: return None
+    if dint.day_mod == None: return n
+
+    # does any day pass within a couple of periods of the modulus?
+    size = 1
+    if dint.dow != None and dint.dow != {0,1,2,3,4,}: size = len(dint.dow)
+    if _day_mod_count(dint, ( 2 * dint.day_mod + 1 ) * size) < 1: return None
+
+    # the count is monotonic, bracket then bisect
+    lo, hi = 0, n
+    while _day_mod_count(dint, hi) < n:
+        lo, hi = hi, 2 * hi
+
+    while hi - lo > 1:
+        mid = ( lo + hi ) // 2
+        if _day_mod_count(dint, mid) < n:
+            lo = mid
+        else:
+            hi = mid
+
+    return hi
+
+# -------------------------------------------------
+
+def _forward( dint, start_ord, end_ord ):
+    """
+    Internal function.
+    Generate the days in the range start_ord < day <= end_ord which pass
+    the year, month and day filters, in ascending order. The day modulus is
+    not applied here since it depends on the position within the results.
+
+    Parameters:
+        dint      - compiled specification to evaluate (_CompiledSpec)
+        start_ord - the starting day of the range as an ordinal (exclusive)
+        end_ord   - the ending day of the range as an ordinal (inclusive)
+
+    Return:
+        Generator of the ordinals of the matching days.
+    """
+
+    first = start_ord + 1
+    if first > end_ord: return
+
+    months = dint.months
+    if len(months) < 1: return
+
+    first_year = datetime.date.fromordinal(first).year
+    last_year = datetime.date.fromordinal(end_ord).year
+
+    for y in _year_candidates(dint, first_year, last_year):
+        table = _month_table(y)
+
+        for m in months:
+            mstart = table[m - 1]
+            mend = table[m]
+            if mend <= first: continue
+            if mstart > end_ord: return
+
+            days = _month_days(dint, mstart, mend)
+
+            # skip the days before the range within the month
+            for i in range( bisect.bisect_left(days, first - mstart + 1), len(days) ):
+                o = mstart + days[i] - 1
+                if o > end_ord: return
+                yield o
+
+# -------------------------------------------------
+
+def _first( dint, start_ord, end_ord, n=1 ):
+    """
+    Internal function.
+    Find the n-th day in the range start_ord < day <= end_ord which passes
+    the year, month and day filters, the n-th result of _forward().
+
+    Parameters:
+        dint      - compiled specification to evaluate (_CompiledSpec)
+        start_ord - the starting day of the range as an ordinal (exclusive)
+        end_ord   - the ending day of the range as an ordinal (inclusive)
+        n         - index of the day to find (starts at 1, default=1)
+
+    Return:
+        The ordinal of the day or None if there are fewer days in the range.
+
+    Notes:
+        * The month of the first day and the following month are indexed 
+          directly, the generators of _forward() are only used when the day
+          is in a later month.
+    """
+
+    for step in range(2):
+        first = start_ord + 1
+        if first > end_ord: return None
+
+        d = datetime.date.fromordinal(first)
+        m = d.month
+        if m not in dint.months or not dint.year_match(d.year): break
+
+        mstart = first - d.day + 1
+        table = _month_tables.get(d.year) or _month_table(d.year)
+
+        days = dint.cache.get( ( (mstart + 6) % 7, table[m] - mstart ) )
+        if days == None: days = _month_days(dint, mstart, table[m])
+
+        i = bisect.bisect_left(days, d.day) + n - 1
+        if i < len(days):
+            o = mstart + days[i] - 1
+            if o > end_ord: return None
+            return o
+
+        # continue after the month with the remaining count
+        n = i - len(days) + 1
+        start_ord = table[m] - 1
+
+    for o in _forward(dint, start_ord, end_ord):
+        n -= 1
+        if n == 0: return o
+    return None
+
+# -------------------------------------------------
+
+def _backward( dint, end_ord, start_ord ):
+    """
+    Internal function.
+    Generate the days in the range start_ord < day < end_ord which pass
+    the year, month and day filters, in descending order. This is the
+    mirror image of _forward().
+
+    Parameters:
+        dint      - compiled specification to evaluate (_CompiledSpec)
+        end_ord   - the ending day of the range as an ordinal (exclusive)
+        start_ord - the starting day of the range as an ordinal (exclusive)
+
+    Return:
+        Generator of the ordinals of the matching days.
+    """
+
+    last = end_ord - 1
+    if last <= start_ord: return
+
+    months = dint.months[::-1]
+    if len(months) < 1: return
+
+    first_year = datetime.date.fromordinal(max(start_ord, 1)).year
+    last_year = datetime.date.fromordinal(last).year
+
+    for y in _year_candidates(dint, first_year, last_year, reverse=True):
+        table = _month_table(y)
+
+        for m in months:
+            mstart = table[m - 1]
+            mend = table[m]
+            if mstart > last: continue
+            if mend <= start_ord + 1: return
+
+            days = _month_days(dint, mstart, mend)
+
+            # skip the days after the range within the month
+            for i in range( bisect.bisect_right(days, last - mstart + 1) - 1, -1, -1 ):
+                o = mstart + days[i] - 1
+                if o <= start_ord: return
+                yield o
+
+# -------------------------------------------------
+
+def _gcd( a, b ):
+    """
+    Internal function.
+    Greatest common divisor of two positive integers.
+    """
+
+    while b: a, b = b, a % b
+    return a
+
+# -------------------------------------------------
+
+def _year_count( dint, year ):
+    """
+    Internal function.
+    Count the days of a year passing the month and day filters. 
+    The year filters are not applied.
+
+    Parameters:
+        dint   - compiled specification to evaluate (_CompiledSpec)
+        year   - the year to count
+
+    Return:
+        Number of matching days (int).
+
+    Notes:
+        * The count only depends on the weekday of Jan 1st and the length
+          of the year, so there are at most 14 distinct results.
+    """
+
+    table = _month_table(year)
+    key = ( 'year', table[0] % 7, table[12] - table[0] )
+    cnt = dint.cache.get(key)
+    if cnt == None:
+        cnt = 0
+        for m in dint.months:
+            cnt += len( _month_days(dint, table[m - 1], table[m]) )
+        dint.cache[key] = cnt
+    return cnt
+
+# -------------------------------------------------
+
+def _period_years( dint ):
+    """
+    Internal function.
+    Obtain the number of years after which the year, month and day filters
+    repeat, when there are no year indices. This is the 400 year Gregorian 
+    cycle combined with the year modulus.
+    """
+
+    if dint.year_mod == None: return 400
+    return 400 * dint.year_mod // _gcd(400, dint.year_mod)
+
+# -------------------------------------------------
+
+def _generate_period_kinds( year_mod=None, year_mod_val=0 ):
+    """
+    Internal function.
+    Group the years of a period (see _period_years()) passing the year 
+    modulus by their kind, the weekday of Jan 1st and the length of the year.
+    Only the years up to datetime.MAXYEAR are included.
+
+    Parameters:
+        year_mod     - year modulus period or None
+        year_mod_val - year modulus phase
+
+    Return:
+        A sorted tuple of ( first year of the kind, number of years of the kind ).
+    """
+
+    period = 400
+    if year_mod != None: period = 400 * year_mod // _gcd(400, year_mod)
+
+    kinds = {}
+    for y in range(1, min(period, datetime.MAXYEAR) + 1):
+        if year_mod != None and ( y % year_mod ) != year_mod_val: continue
+        x = y - 1
+        first_wd = ( x * 365 + x // 4 - x // 100 + x // 400 + 1 ) % 7
+        leap = ( y % 4 == 0 and y % 100 != 0 ) or y % 400 == 0
+        kind = kinds.setdefault( (first_wd, leap), [y, 0] )
+        kind[1] += 1
+
+    return tuple( sorted( tuple(x) for x in kinds.values() ) )
+
+# -------------------------------------------------
+
+def _cycle_year_kind( year ):
+    """
+    Internal function.
+    Obtain the first year of the 400 year cycle of the same kind as a year
+    (weekday of Jan 1st and length), which has the same _year_count().
+    """
+    global _cycle_firsts
+
+    if _cycle_firsts == None:
+        firsts, kinds = [], {}
+        for y in range(1, 401):
+            table = _month_table(y)
+            firsts.append( kinds.setdefault( (table[0] % 7, table[12] - table[0]), y ) )
+        _cycle_firsts = tuple(firsts)
+
+    return _cycle_firsts[ (year - 1) % 400 ]
+
+# -------------------------------------------------
+
+def _period_kinds( dint ):
+    """
+    Internal function.
+    Obtain the kinds of years of the period of a specification, see 
+    _generate_period_kinds(). The year indices are not applied.
+    """
+    global _cycle_kinds
+
+    if dint.year_mod == None:
+        if _cycle_kinds == None: _cycle_kinds = _generate_period_kinds()
+        return _cycle_kinds
+
+    key = ( dint.year_mod, dint.year_mod_val )
+    kinds = _period_kinds_cache.get(key)
+    if kinds == None:
+        kinds = _period_kinds_cache[key] = _generate_period_kinds(*key)
+    return kinds
+
+# -------------------------------------------------
+
+def _period_count( dint ):
+    """
+    Internal function.
+    Count the matching days in a single period of _period_years() years.
+
+    Parameters:
+        dint   - compiled specification to evaluate (_CompiledSpec)
+
+    Return:
+        Number of matching days (int).
+    """
+
+    key = ( 'period', )
+    cnt = dint.cache.get(key)
+    if cnt == None:
+        # the count of a year only depends on its kind
+        cnt = 0
+        for y, n in _period_kinds(dint):
+            cnt += n * _year_count(dint, y)
+        dint.cache[key] = cnt
+    return cnt
+
+# -------------------------------------------------
+
+def _period_prefix( dint ):
+    """
+    Internal function.
+    Obtain the cumulative counts of the years of a period (see _period_years()),
+    element r is the number of matching days of the years 1 to r.
+
+    Return:
+        A list of period + 1 counts, False if the period is longer than
+        _max_prefix_years.
+    """
+
+    key = ( 'prefix', )
+    prefix = dint.cache.get(key)
+    if prefix == None:
+        prefix = False
+        period = _period_years(dint)
+        if period <= _max_prefix_years:
+            # the count of a year only depends on its kind
+            counts = {}
+            prefix = [0]
+            for y in range(1, period + 1):
+                cnt = prefix[-1]
+                if dint.year_mod == None or ( y % dint.year_mod ) == dint.year_mod_val:
+                    k = _cycle_year_kind(y)
+                    if k not in counts: counts[k] = _year_count(dint, k)
+                    cnt += counts[k]
+                prefix.append(cnt)
+        dint.cache[key] = prefix
+    return prefix
+
+# -------------------------------------------------
+
+def _count_years( dint, first, last ):
+    """
+    Internal function.
+    Count the matching days in the inclusive range of years [first, last].
+
+    Parameters:
+        dint   - compiled specification to evaluate (_CompiledSpec)
+        first  - first year of the range
+        last   - last year of the range
+
+    Return:
+        Number of matching days (int).
+
+    Notes:
+        * Without year indices, the filters repeat with the 400 year 
+          Gregorian cycle combined with the year modulus. Whole periods
+          are counted with a single multiplication so the cost doesn't
+          depend on the length of the range, the rest of a period is
+          taken from the cumulative counts of _period_prefix().
+    """
+
+    if last < first: return 0
+
+    total = 0
+    if dint.year_indx == None:
+        prefix = _period_prefix(dint)
+        if prefix:
+            period = len(prefix) - 1
+            upto = lambda y: ( y // period ) * prefix[-1] + prefix[y % period]
+            return upto(last) - upto(first - 1)
+
+        period = _period_years(dint)
+        nperiods = ( last - first + 1 ) // period
+        if nperiods > 0:
+            total += nperiods * _period_count(dint)
+            first += nperiods * period
+
+    for y in _year_candidates(dint, first, last):
+        total += _year_count(dint, y)
+
+    return total
+
+# -------------------------------------------------
+
+def _count_upto( dint, o ):
+    """
+    Internal function.
+    Count the days passing the year, month and day filters from the first
+    representable day up to and including the given day. 
+
+    Parameters:
+        dint  - compiled specification to evaluate (_CompiledSpec)
+        o     - ordinal of the last day to count
+
+    Return:
+        Number of matching days (int).
+    """
+
+    if o < 1: return 0
+    o = min( o, datetime.date.max.toordinal() )
+
+    if len(dint.months) < 1: return 0
+
+    year = datetime.date.fromordinal(o).year
+    total = _count_years(dint, datetime.MINYEAR, year - 1)
+
+    if dint.year_match(year):
+        table = _month_table(year)
+        for m in dint.months:
+            mstart = table[m - 1]
+            if mstart > o: break
+            days = _month_days(dint, mstart, table[m])
+            total += bisect.bisect_right(days, o - mstart + 1)
+
+    return total
+
+# -------------------------------------------------
+
+def _count( dint, start_ord, end_ord ):
+    """
+    Internal function.
+    Count the days in the range start_ord < day <= end_ord which pass the
+    year, month and day filters, without generating them.
+
+    Parameters:
+        dint      - compiled specification to evaluate (_CompiledSpec)
+        start_ord - the starting day of the range as an ordinal (exclusive)
+        end_ord   - the ending day of the range as an ordinal (inclusive)
+
+    Return:
+        Number of matching days (int).
+    """
+
+    if end_ord <= start_ord: return 0
+    return _count_upto(dint, end_ord) - _count_upto(dint, start_ord)
+
+# -------------------------------------------------
+
+def _nth( dint, start_ord, k ):
+    """
+    Internal function.
+    Find the k-th day after start_ord passing the year, month and day 
+    filters. Whole periods, years and months are skipped using their counts, 
+    only the days of the final month are indexed.
+
+    Parameters:
+        dint      - compiled specification to evaluate (_CompiledSpec)
+        start_ord - the starting day as an ordinal (exclusive)
+        k         - the index of the day to find (starts at 1)
+
+    Return:
+        The ordinal of the day or None if it doesn't exist.
+    """
+
+    if k < 1: return None
+    if start_ord >= datetime.date.max.toordinal(): return None
+
+    months = dint.months
+    if len(months) < 1: return None
+    
+    remaining = k
+
+    # the remainder of the first year
+    year = datetime.date.fromordinal( max(start_ord, 0) + 1 ).year
+    if dint.year_match(year):
+        table = _month_table(year)
+        for m in months:
+            mstart = table[m - 1]
+            if table[m] <= start_ord + 1: continue
+
+            days = _month_days(dint, mstart, table[m])
+            i = bisect.bisect_right(days, start_ord - mstart + 1)
+            if remaining <= len(days) - i:
+                return mstart + days[i + remaining - 1] - 1
+            remaining -= len(days) - i
+    year += 1
+
+    # skip whole periods
+    if dint.year_indx == None:
+        cnt = _period_count(dint)
+        if cnt < 1: return None
+        nperiods = ( remaining - 1 ) // cnt
+        year += nperiods * _period_years(dint)
+        remaining -= nperiods * cnt
+
+    # skip whole years, then whole months
+    for y in _year_candidates(dint, year, datetime.MAXYEAR):
+        cnt = _year_count(dint, y)
+        if remaining > cnt:
+            remaining -= cnt
+            continue
+
+        table = _month_table(y)
+        for m in months:
+            days = _month_days(dint, table[m - 1], table[m])
+            if remaining <= len(days):
+                return table[m - 1] + days[remaining - 1] - 1
+            remaining -= len(days)
+
+    return None
+
+# -------------------------------------------------
+
+def _analyze( dint ):
+    """
+    Internal function.
+    Satisfiability analysis of a specification. Either prove from the 
+    filter values that no day can ever match, or find the first and last 
+    days which can match.
+
+    Parameters:
+        dint  - compiled specification to evaluate (_CompiledSpec)
+
+    Return:
+        None if the specification can never match, otherwise a 2-tuple of the
+        ordinals of the first and last days passing the year, month and day 
+        filters.
+
+    Notes:
+        * The day modulus can't extend the range, it is only checked for 
+          a phase that can never be reached.
+        * The count of a year only depends on the weekday of Jan 1st and the
+          length of the year. Once all 14 kinds of years are known to be
+          empty, the remaining years don't need to be checked.
+    """
+
+    if len(dint.months) < 1: return None
+    if _day_mod_index(dint, 1) == None: return None
+
+    if dint.year_indx == None:
+        # the filters repeat with the period, one period decides
+        if _period_count(dint) < 1: return None
+    else:
+        kinds = set()
+        for y in _year_candidates(dint, datetime.MINYEAR, datetime.MAXYEAR):
+            if _year_count(dint, y) > 0: break
+            table = _month_table(y)
+            kinds.add( ( table[0] % 7, table[12] - table[0] ) )
+            if len(kinds) >= 14: return None
+        else:
+            return None
+
+    first = _nth(dint, 0, 1)
+    last = next( _backward(dint, datetime.date.max.toordinal() + 1, 0), None )
+    if first == None or last == None: return None
+
+    return ( first, last )
+
+# -------------------------------------------------
+
+def _contains( dint, o, anchor ):
+    """
+    Internal function.
+    Test if a day is an occurance. The day modulus phase is computed from
+    the count of matching days between the anchor and the day.
+
+    Parameters:
+        dint   - compiled specification to evaluate (_CompiledSpec)
+        o      - ordinal of the day to test
+        anchor - ordinal of the anchor day
+
+    Return:
+        True if the day is an occurance.
+
+    Notes:
+        * After the anchor the phase matches next_occurances() starting at
+          the anchor, before the anchor it matches previous_occurances() 
+          ending at the anchor. The anchor itself is count zero of the 
+          forward search.
+    """
+
+    if o < 1 or o > datetime.date.max.toordinal(): return False
+
+    # year, month and day filters
+    if not dint.match(o): return False
+
+    if dint.day_mod == None: return True
+
+    # day modulus phase relative to the anchor
+    if o >= anchor:
+        return _day_mod_match(dint, _count(dint, anchor, o))
+    else:
+        return _day_mod_match(dint, _count(dint, o - 1, anchor - 1), reverse=True)
+
+# -------------------------------------------------
+
+# names of the filter attributes of a specification
+_filter_names = ( 'day_mod', 'day_mod_val', 'dow', 'dom', 'week_indx', 'month_mod', 
+                  'month_mod_val', 'month_indx', 'year_mod', 'year_mod_val', 'year_indx' )
+
+# -------------------------------------------------
+
+def _all_of( tests ):
+    """
+    Internal function.
+    Combine predicates into a single predicate passing when all of them pass.
+    Trivial combinations are returned directly to avoid the extra call.
+    """
+
+    tests = tuple(tests)
+    if len(tests) == 0: return lambda *args: True
+    if len(tests) == 1: return tests[0]
+
+    def _test(*args):
+        for t in tests:
+            if not t(*args): return False
+        return True
+    return _test
+
+# -------------------------------------------------
+
+def _compile_year_match( dint ):
+    """
+    Internal function.
+    Build the predicate year --> bool of the active year filters.
+    """
+
+    tests = []
+    if dint.year_indx != None:
+        tests.append( dint.years.__contains__ )
+    if dint.year_mod != None:
+        mod, val = dint.year_mod, dint.year_mod_val
+        tests.append( lambda y: y % mod == val )
+
+    return _all_of(tests)
+
+# -------------------------------------------------
+
+def _compile_match( dint ):
+    """
+    Internal function.
+    Build the predicate ordinal --> bool of the active year, month and day
+    filters. The day modulus isn't included.
+    """
+
+    year_match = dint.year_match
+    months = frozenset(dint.months)
+
+    tests = []
+    if dint.dow != None:
+        dow = frozenset(dint.dow)
+        # ordinal 1 was a Monday (0)
+        tests.append( lambda o, d: (o + 6) % 7 in dow )
+    if dint.dom != None:
+        dom = frozenset(dint.dom)
+        tests.append( lambda o, d: d.day in dom )
+    if dint.week_indx != None:
+        week = dint.week_indx
+        tests.append( lambda o, d: int( (d.day - 1) / 7 ) == week )
+    day_match = _all_of(tests)
+
+    def _match(o):
+        d = datetime.date.fromordinal(o)
+        return year_match(d.year) and d.month in months and day_match(o, d)
+    return _match
+
+# -------------------------------------------------
+
+class _CompiledSpec(object):
+    """
+    Internal class.
+    Compiled form of a specification used by the engine. This is a snapshot 
+    of the filter values along with everything derived from them once:
+        years      - year indices (IntervalSet or None)
+        months     - months passing the month filters (tuple)
+        year_match - predicate of the active year filters
+        match      - predicate of the active year, month and day filters
+        first_pass - count of the first matching day of a search passing the
+                     day modulus, see _day_mod_index()
+        cache      - per month day lists and per year/period counts
+        analysis   - satisfiability analysis, see _analyze(), computed on
+                     first use so that parsing doesn't pay for it
+
+    The set valued filters are frozen, so the snapshot can't change after 
+    it is built.
+    """
+    def __init__(self, dint):
+        for name in _filter_names:
+            value = getattr(dint, name)
+            if isinstance(value, (set, list, tuple)): value = frozenset(value)
+            setattr(self, name, value)
+
+        self.years = None
+        if self.year_indx != None:
+            self.years = self.year_indx
+            if not isinstance(self.years, IntervalSet): self.years = IntervalSet(self.years)
+
+        self.months     = tuple( _month_candidates(self) )
+        self.cache      = {}
+        self.year_match = _compile_year_match(self)
+        self.match      = _compile_match(self)
+        self.first_pass = _day_mod_index(self, 1)
+        self._analysis  = False   # not analyzed yet
+
+    @property
+    def analysis(self):
+        # threads analyzing at once compute the same result
+        analysis = self._analysis
+        if analysis is False:
+            analysis = self._analysis = _analyze(self)
+        return analysis
+
+# -------------------------------------------------
@@ -0,0 +1,179 @@
+"""
+intervals.py
+Set of integers stored as a sorted list of inclusive intervals.
+
+Ranges such as "2000 to 9000" are kept as a single interval instead of
+thousands of set members. Membership is a bisection, the bounds are the
+ends of the first and last intervals.
+"""
+
+import bisect
+
+try:
+    from collections.abc import Set
+except ImportError:
+    from collections import Set
+
+# -------------------------------------------
+
+class IntervalSet(Set):
+    """
+    Immutable set of integers, stored as sorted disjoint inclusive intervals.
+    It compares equal to a set with the same members and hashes the same as
+    the equivalent frozenset.
+
+    For example:
+        IntervalSet.from_range(2000, 9000) --> intervals ((2000, 9000),)
+        IntervalSet({1,2,3,7})              --> intervals ((1, 3), (7, 7))
+    """
+    __slots__ = ( '_lo', '_hi', '_len', '_hashval' )
+
+    def __init__(self, values=()):
+        lo, hi = [], []
+        for x in sorted(set(values)):
+            if len(hi) > 0 and x == hi[-1] + 1:
+                hi[-1] = x
+            else:
+                lo.append(x); hi.append(x)
+        self._set(lo, hi)
+
+    def _set(self, lo, hi):
+        """
+        Internal function.
+        Store the interval bounds, sorted and not overlapping or touching.
+        """
+
+        self._lo = tuple(lo)
+        self._hi = tuple(hi)
+        self._len = sum( h - l + 1 for l, h in zip(self._lo, self._hi) )
+        self._hashval = None
+
+    @classmethod
+    def from_range(cls, first, last):
+        """
+        Build the set of the inclusive range [first, last], empty if last < first.
+        """
+
+        if last < first: return cls.from_intervals(())
+        return cls.from_intervals( ((first, last),) )
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        """
+        Build the set from inclusive (first, last) intervals, in any order and
+        possibly overlapping.
+        """
+
+        lo, hi = [], []
+        for first, last in sorted(intervals):
+            if last < first: continue
+            if len(hi) > 0 and first <= hi[-1] + 1:
+                hi[-1] = max(hi[-1], last)
+            else:
+                lo.append(first); hi.append(last)
+
+        self = cls.__new__(cls)
+        self._set(lo, hi)
+        return self
+
+    # ---------------------------
+
+    @property
+    def intervals(self):
+        """
+        The sorted inclusive (first, last) intervals.
+        """
+
+        return tuple( zip(self._lo, self._hi) )
+
+    @property
+    def lower(self):
+        """
+        Smallest member, None if empty.
+        """
+
+        return self._lo[0] if self._len > 0 else None
+
+    @property
+    def upper(self):
+        """
+        Largest member, None if empty.
+        """
+
+        return self._hi[-1] if self._len > 0 else None
+
+    # ---------------------------
+
+    def __contains__(self, x):
+        i = bisect.bisect_right(self._lo, x) - 1
+        return i >= 0 and x <= self._hi[i]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for l, h in zip(self._lo, self._hi):
+            for x in range(l, h + 1): yield x
+
+    def __reversed__(self):
+        for l, h in zip(reversed(self._lo), reversed(self._hi)):
+            for x in range(h, l - 1, -1): yield x
+
+    def irange(self, first, last, reverse=False):
+        """
+        Generate the members in the inclusive range [first, last].
+
+        Parameters:
+            first   - first value of the range
+            last    - last value of the range
+            reverse - generate the members in descending order (default=False)
+
+        Return:
+            Generator of the members (int).
+        """
+
+        # intervals overlapping the range
+        i = max( bisect.bisect_right(self._lo, first) - 1, 0 )
+        j = bisect.bisect_right(self._lo, last)
+
+        if reverse:
+            for k in range(j - 1, i - 1, -1):
+                for x in range( min(self._hi[k], last), max(self._lo[k], first) - 1, -1 ): yield x
+        else:
+            for k in range(i, j):
+                for x in range( max(self._lo[k], first), min(self._hi[k], last) + 1 ): yield x
+
+    # ---------------------------
+
+    def __eq__(self, other):
+        if isinstance(other, IntervalSet):
+            return self._lo == other._lo and self._hi == other._hi
+        return Set.__eq__(self, other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented: return result
+        return not result
+
+    def __hash__(self):
+        if self._hashval == None:
+            self._hashval = self._hash()
+        return self._hashval
+
+    def __reduce__(self):
+        return ( _from_intervals, (self.intervals,) )
+
+    def __repr__(self):
+        return 'IntervalSet.from_intervals(%r)' % (self.intervals,)
+
+# -------------------------------------------
+
+def _from_intervals( intervals ):
+    """
+    Internal function.
+    Rebuild an IntervalSet from its intervals, used by pickle.
+    """
+
+    return IntervalSet.from_intervals(intervals)
+
+# -------------------------------------------
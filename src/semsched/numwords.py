@@ -7,6 +7,7 @@ Interconvert English words with whole numbers.
 Example: 
     int2words('555') = 'five hundred fifty five'
     words2int('one') = 1
+    try_words2int('blue') = None
     words2int('first') = 1 
     words2int('a hundred') = 100
     words2int('none') = 0
@@ -255,3 +256,71 @@ def words2int(val):
     return result
 
 # -----------------------------------
+
+# ordinal suffixes of try_words2int (21st, 3rd)
+_ordinal_suffixes = {'st', 'nd', 'rd', 'th'}
+
+# words converted by float() before the word bank is used
+_float_words = {'inf', 'infinity', 'nan'}
+
+# memo of try_words2int for the other phrases, cleared when full or when 
+# the word bank is replaced
+_memo = {}
+_memo_size = 1024
+_memo_wordbank = None
+_memo_missing = object()
+
+def try_words2int(val):
+    """
+    Convert a written representation of the given value to an integer,
+    the same as words2int but returning None instead of raising an 
+    exception when it can't be converted.
+
+    Parameters:
+        val - the written representation of the value
+
+    Notes:
+        Plain digits, ordinals and single words are converted directly,
+        other phrases go through words2int and the results are memoized.
+    """
+
+    global _wordbank, _memo, _memo_wordbank
+    if _wordbank == None: _wordbank = _generate_wordbank()
+
+    if not isinstance(val, type(u'a')):
+        try:
+            return words2int(val)
+        except Exception:
+            return None
+
+    # plain digits and ordinals, these are checked without regular
+    # expressions to keep the import light
+    if len(val) > 0 and val.strip('0123456789') == '': return float(val)
+
+    if len(val) > 2 and val[-2:].lower() in _ordinal_suffixes and val[:-2].strip('0123456789') == '':
+        return int(val[:-2])
+
+    if val.isalpha() and val.lower() not in _float_words:
+        # a single word is either the skipped 'and', known or not a number
+        if val.lower() == 'and': return 0
+        if val in _wordbank: return max( _wordbank[val], 0 )
+        return None
+
+    # the memo is only replaced, never cleared, so the other threads can 
+    # keep using the one they hold
+    memo = _memo
+    if _memo_wordbank is not _wordbank or len(memo) >= _memo_size:
+        memo = _memo = {}
+        _memo_wordbank = _wordbank
+
+    result = memo.get(val, _memo_missing)
+    if result is _memo_missing:
+        try:
+            result = words2int(val)
+        except Exception:
+            result = None
+        memo[val] = result
+
+    return result
+
+# -----------------------------------
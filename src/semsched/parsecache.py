@@ -0,0 +1,176 @@
+"""
+parsecache.py
+Bounded least recently used cache of parsed phrases.
+
+The phrases are normalized before the lookup, with the leading, trailing
+and repeated spaces removed, so variations of the same phrase share a single
+entry. The normalized phrase is what gets parsed, which keeps the result
+independent of the variation seen first. The case and the punctuation are
+kept, the parser depends on them (e.g. 'second' is a number but 'Second'
+isn't, a tab or '!' isn't part of a date literal), so removing them would
+change the parse result.
+
+The entries are the compiled specifications (see engine._CompiledSpec),
+snapshots which are never modified and are shared by every instance
+created from the same phrase.
+"""
+
+from collections import OrderedDict, namedtuple
+
+try:
+    from _thread import allocate_lock
+except ImportError:
+    from thread import allocate_lock
+
+# statistics of a cache, as returned by ParseCache.info()
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'evictions', 'maxsize', 'currsize'))
+
+# default number of cached phrases
+_default_maxsize = 4096
+
+# -------------------------------------------
+
+def normalize_phrase( phrase ):
+    """
+    Obtain the normalized form of a phrase used as the cache key.
+
+    Parameters:
+        phrase - human readable phrase
+
+    Return:
+        The phrase with the leading and trailing spaces removed and the
+        repeated spaces replaced by a single one, which the parser ignores.
+    """
+
+    return ' '.join([ x for x in phrase.split(' ') if x ])
+
+# -------------------------------------------
+
+class ParseCache(object):
+    """
+    Thread safe, bounded least recently used cache of parsed phrases.
+
+    Parameters:
+        maxsize - maximum number of entries, None for no limit and 0 to
+                  disable the caching (default=4096)
+    """
+    def __init__(self, maxsize=_default_maxsize):
+        self._lock = allocate_lock()
+        self._entries = OrderedDict()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # ---------------------------
+
+    def get(self, phrase):
+        """
+        Obtain the shared parse result of a phrase, parsing it on a miss.
+
+        Parameters:
+            phrase - human readable phrase
+
+        Return:
+            The compiled specification of the normalized phrase.
+
+        Notes:
+            * Parse errors are raised and nothing is cached.
+            * The parsing is done without holding the lock, two threads
+              missing on the same phrase at once both parse it and the
+              first one stored is kept.
+        """
+
+        key = normalize_phrase(phrase)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry != None:
+                self._hits += 1
+                self._touch(key)
+                return entry
+            self._misses += 1
+
+        from .dintspec import DateIntervalSpec
+        entry = DateIntervalSpec(key).compile()
+
+        with self._lock:
+            if key in self._entries:
+                entry = self._entries[key]
+                self._touch(key)
+            elif self._maxsize != 0:
+                self._entries[key] = entry
+                self._evict()
+
+        return entry
+
+    # ---------------------------
+
+    def _touch(self, key):
+        """
+        Internal function.
+        Mark an entry as the most recently used, the lock must be held.
+        """
+
+        self._entries[key] = self._entries.pop(key)
+
+    # ---------------------------
+
+    def _evict(self):
+        """
+        Internal function.
+        Remove the least recently used entries above the size limit, the
+        lock must be held.
+        """
+
+        if self._maxsize == None: return
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    # ---------------------------
+
+    def info(self):
+        """
+        Obtain the cache statistics.
+
+        Return:
+            CacheInfo namedtuple of (hits, misses, evictions, maxsize, currsize).
+        """
+
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._maxsize, len(self._entries))
+
+    # ---------------------------
+
+    def clear(self):
+        """
+        Remove every entry and reset the statistics.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    # ---------------------------
+
+    def resize(self, maxsize):
+        """
+        Change the maximum number of entries, evicting the least recently
+        used entries above the new limit.
+
+        Parameters:
+            maxsize - maximum number of entries, None for no limit and 0 to
+                      disable the caching
+        """
+
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+# -------------------------------------------
+
+# cache shared by DateIntervalSpec.from_phrase() and CompactSpec.from_phrase()
+parse_cache = ParseCache()
+
+# -------------------------------------------
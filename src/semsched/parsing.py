@@ -4,16 +4,179 @@ parse.py
 Implementation of semantic parser of date phrases.
 """
 
-import re, datetime
+import datetime
 from . import numwords
-from .defs import _modifiers, _days, _months, _make_pattern, _spec_alias_lookup
+from .defs import _modifiers, _days, _months, _alias_forms, _spec_alias_lookup
+from .intervals import IntervalSet
 
 # this holds a cached version of the regex representation of regex patterns 
-# for semantic parsing
+# for semantic parsing. These are compiled on the first parse and the re module
+# is only imported then, which keeps it out of the import time of the package.
 _pattn = None
 
+# date literal formats, in the order they are tried by parse(). These are the 
+# strptime formats '%Y%M%d', '%d%b%Y', '%Y-%M', '%b%Y' and '%d%b', with the same 
+# directive patterns, so the literals are recognized without raising exceptions.
+# Note: %M is the minutes, the month of the first two formats is January.
+_literal_fmts = None
+_literal_months = ( 'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec' )
+
 # -------------------------------------------------
 
+def _date_literal( phrase ):
+    """
+    Internal function.
+    Recognize a phrase which is a date literal, equivalent to trying 
+    datetime.strptime with each of the literal formats in turn.
+
+    Parameters:
+        phrase - the phrase with the spaces and dashes removed
+    
+    Return:
+        None if the phrase isn't a date literal, otherwise a 3-tuple of 
+        (year, month, day of month) where year and day are None when they
+        aren't part of the format.
+    """
+    global _literal_fmts
+
+    # only digits and a month abbreviation can be a literal, which is 
+    # checked before compiling the patterns
+    rest = [ c for c in phrase if not c.isdigit() and c not in ' -' ]
+    if len(rest) != 0 and len(rest) != 3: return None
+
+    if _literal_fmts == None:
+        import re
+        Y = r'(?P<Y>\d\d\d\d)'
+        M = r'(?P<M>[0-5]\d|\d)'
+        d = r'(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])'
+        b = r'(?P<b>' + '|'.join(_literal_months) + ')'
+        _literal_fmts = [ re.compile(x, re.I) for x in ( Y+M+d, d+b+Y, Y+'-'+M, b+Y, d+b ) ]
+
+    for pattn in _literal_fmts:
+        # like strptime, the first match has to cover the whole phrase
+        found = pattn.match(phrase)
+        if found == None or found.end() != len(phrase): continue
+        fields = found.groupdict()
+
+        year, day = None, None
+        month = 1
+        if 'Y' in fields: year = int(fields['Y'])
+        if 'b' in fields: month = _literal_months.index(fields['b'].lower()) + 1
+        if 'd' in fields: day = int(fields['d'])
+
+        # strptime checks the date, with the year 1900 when it isn't given
+        try:
+            datetime.date(1900 if year == None else year, month, 1 if day == None else day)
+        except ValueError:
+            continue
+
+        return ( year, month, day )
+
+    return None
+
+# -------------------------------------------------
+
+def _alias_versions():
+    """
+    Internal function.
+    Obtain the versions of the alias maps, these change with every change to the maps.
+    """
+
+    return ( getattr(_modifiers, 'version', None), getattr(_days, 'version', None), 
+             getattr(_months, 'version', None) )
+
+# ---------------------------------------------------
+
+def _compile_patterns():
+    """
+    Internal function.
+    Compile the tokenizer patterns and the token form tables into _pattn.
+
+    Return:
+        The compiled patterns, the new value of _pattn.
+
+    Notes: 
+        * The separators aren't bounded by words (e.g. 'ninth' --> 'n', 'th'),
+          the token pattern only ends a token where a separator starts.
+        * The forms of the modifiers, days and months are the aliases 
+          (and plurals) of _modifiers, _days and _months, see _alias_forms().
+          These are compiled again when the alias maps are changed.
+    """
+    global _pattn
+    import re
+
+    sep = '(?:for|of|in|to)[ ]*(?:the|a)?|[ ]'
+
+    pattn = {}
+    pattn['filter']  = re.compile(u'[^0-9a-zA-Z \u212a]')
+    pattn['token']   = re.compile('(?P<sep>' + sep + ')|(?P<word>(?:[^ fiot]+|(?!for|of|in|to)[fiot])+)', re.I)
+    pattn['mods']    = _alias_forms(_modifiers, plurals=0)
+    pattn['day']     = _alias_forms(_days, plurals=2)
+    pattn['month']   = _alias_forms(_months, plurals=3)
+    pattn['version'] = _alias_versions()
+    _pattn = pattn
+    return pattn
+
+# ---------------------------------------------------
+
+def _tokenize( phrase ):
+    """
+    Internal function.
+    Split a phrase into tokens and classify them in a single pass.
+
+    Input: 
+        phrase - the phrase to process.
+
+    Return:
+        A list of 3-tuples ( kind, token, value ) for each token, where kind is 
+        one of 'sep', 'mod', 'num', 'year', 'month', 'day' or 'other'. The value 
+        is the number of 'num' tokens and the canonical alias key of 'mod', 
+        'month' and 'day' tokens, otherwise None.
+
+    Notes: 
+        * Characters other than letters, digits and spaces are removed, 
+          ',', '-' and tabs separate the tokens.
+        * The kinds are checked in the order modifier, number, year, month, 
+          day. Numbers take precedence over the 4 digit years.
+        * Numbers are converted with numwords.try_words2int.
+    """
+    # the same tables are used for the whole phrase, even if another thread
+    # compiles them again meanwhile
+    pattn = _pattn
+    if pattn == None or pattn['version'] != _alias_versions(): pattn = _compile_patterns()
+
+    # pre-process, remove non-alphanumeric characters
+    phrase = phrase.replace(',',' ').replace('-',' ').replace('\t',' ')
+    phrase = pattn['filter'].sub('', phrase)
+
+    tokens = []
+    for found in pattn['token'].finditer(phrase):
+        p = found.group('word')
+        if p == None:
+            tokens.append( ('sep', found.group('sep'), None) )
+            continue
+
+        low = p.lower()
+        if low in pattn['mods']:
+            tokens.append( ('mod', p, pattn['mods'][low]) )
+            continue
+
+        val = numwords.try_words2int(p)
+        if val != None:
+            tokens.append( ('num', p, val) )
+        elif low[:4] == 'year' or ( len(p) >= 4 and p[:4].strip('0123456789') == '' ):
+            tokens.append( ('year', p, None) )
+        elif low in pattn['month']:
+            tokens.append( ('month', p, pattn['month'][low]) )
+        elif low in pattn['day']:
+            tokens.append( ('day', p, pattn['day'][low]) )
+        else:
+            tokens.append( ('other', p, None) )
+
+    return tokens
+
+# ---------------------------------------------------
+
 def _parse_groups( phrase ):
     """
     Internal function.
@@ -29,56 +192,28 @@ def _parse_groups( phrase ):
         with each grouping.
     
     Notes: 
-        This references _days, _months, _modifiers, _pattn private arrays above.
+        The tokens are classified by _tokenize().
     """
-    global _days, _months, _modifiers, _pattn
-    
-    # compile regex patterns (as needed)
-    if _pattn == None:
-        _pattn = {}
-        _pattn['sep']   = re.compile('((for|of|in|to)[ ]*(the|a)?|to|for|of|in|[ ])', re.I)
-        _pattn['year']  = re.compile('(year[s]?|[0-9][0-9][0-9][0-9])', re.I)
-        _pattn['day']   = _make_pattern(_days, exact_match=True, plurals=2)
-        _pattn['month'] = _make_pattern(_months, exact_match=True, plurals=3)
-        _pattn['mods']  = _make_pattern(_modifiers, exact_match=True, plurals=0)
-    
-    # pre-process, remove non-alphanumeric characters
-    phrase = phrase.replace(',',' ').replace('-',' ').replace('\t',' ')
-    allow_characters = '0123456789abcdefghijklmnopqmnopqrstuvwxyz '
-    phrase = ''.join([ c for c in phrase if c.lower() in allow_characters ])
-    parts = [ x for x in _pattn['sep'].sub('|', phrase).split('|') if len(x.strip()) > 0 ]
 
     parsed = {'other':[]}
     args = []
 
-    for p in parts:
-        # see if the current part is a modifier
-        if _pattn['mods'].match(p):
-            args.append(p)
-            continue
+    for kind, p, val in _tokenize(phrase):
+        if kind == 'sep': continue
 
-        # see if the current part is numeric 
-        # of can be interpreted as numeric
-        try:
-            val = numwords.words2int(p)
+        if kind == 'mod':
+            # a modifier
+            args.append(p)
+        elif kind == 'num':
+            # numeric or can be interpreted as numeric
             args.append(val)
-            continue
-        except:
-            pass
-
-        matched = False
-        
-        # iterate over groups
-        for k in ('year','month','day',):
-            if _pattn[k].match(p):
-                parsed[k] = (p,args)
-                args = []
-                matched = True
-                break
-        
-        # we found an unknown part
-        if matched == False:
+        elif kind == 'other':
+            # we found an unknown part
             parsed['other'].append((p,[]))
+        else:
+            # a year, month or day group
+            parsed[kind] = (p,args)
+            args = []
 
     # ---------------- end of part decoding loop
 
@@ -198,7 +333,7 @@ def _get_day_config( spec=None, args=[] ):
                 # range was specified
                 _minval = max(1, min(intargs))
                 _maxval = min( max(intargs), 31)
-                dom = { x for x in range(_minval,_maxval + 1) }
+                dom = IntervalSet.from_range(_minval, _maxval)
         
         elif spec == 'weekday':
             # this is a special case of the below case
@@ -313,7 +448,7 @@ def _get_month_config( spec=None, args=[] ):
                 # range was specified
                 _minval = max(1, min(intargs))
                 _maxval = min( max(intargs), 31)
-                dom = { x for x in range(_minval, _maxval + 1) }
+                dom = IntervalSet.from_range(_minval, _maxval)
         else:
             raise ValueError('Unknown index or interval given: %i' % val)
     
@@ -380,13 +515,13 @@ def _get_year_config( spec=None, args=[] ):
             mod = val
         else:
             # single year index was specified
-            indx = {val}
+            indx = IntervalSet.from_range(val, val)
         
     elif len(intargs) > 1:
         # a range was specified
         _minval = min(intargs)
         _maxval = max(intargs)
-        indx = { x for x in range(_minval, _maxval + 1) }
+        indx = IntervalSet.from_range(_minval, _maxval)
     else:
         # no specific years are specified.
         pass
@@ -408,21 +543,18 @@ def parse( dint, phrase ):
         A reference of the instance representing the specific date filtering configuration.
     """
 
-    fmt = ( '%Y%M%d', '%d%b%Y', '%Y-%M', '%b%Y', '%d%b' )
-    phrase2 = phrase.replace('-','').replace(' ','')
-    for f in fmt:
-        try:
-            val = datetime.datetime.strptime(phrase2, f).date()
-            if '%Y' in f:
-                dint.year_indx = {val.year}
+    # date literals, e.g. 20220105, 5 Jan 2022, Jan 2022, 5 Jan
+    val = _date_literal( phrase.replace('-','').replace(' ','') )
+    if val != None:
+        year, month, day = val
+        if year != None:
+            dint.year_indx = IntervalSet.from_range(year, year)
 
-            dint.month_indx = val.month
-            
-            if '%d' in f:
-                dint.dom = {val.day}
-            return dint
-        except Exception:
-            pass
+        dint.month_indx = month
+        
+        if day != None:
+            dint.dom = {day}
+        return dint
 
     # parse the input phrase into it's component groups
     groups = _parse_groups(phrase)   
@@ -0,0 +1,342 @@
+"""
+queries.py
+Queries shared by the specification classes.
+
+The classes provide the filter attributes, the start_date anchor and
+compile(), the queries are answered by the search engine from the
+compiled form.
+"""
+
+import datetime
+from .cycle import CycleTable
+from .engine import _forward, _first, _backward, _day_mod_match, _day_mod_count, _day_mod_index, _count, _nth, _contains
+
+# ordinal of the default end date of next() and next_occurances()
+_default_end = datetime.date(9999,1,1).toordinal()
+
+# -------------------------------------------
+
+class IntervalQueries(object):
+    """
+    Occurance queries of a date interval specification, see DateIntervalSpec.
+    """
+    __slots__ = ()
+
+    def to_cycle(self):
+        """
+        Precompile the specification into a CycleTable, which answers next, 
+        previous, count and contains queries by bisection without scanning.
+
+        Return:
+            A CycleTable snapshot of the current specification.
+
+        Note: 
+            Raises ValueError when year_indx is used, since the specification 
+            doesn't repeat in that case.
+        """
+
+        return CycleTable(self)
+    
+    # ---------------------------
+
+    def possible_range(self):
+        """
+        Obtain the range of dates in which the interval can have occurances.
+
+        Return:
+            None if the interval can never occur (e.g. the 31st of Feb), otherwise
+            a 2-tuple of the first and last dates that can possibly occur.
+
+        Note: 
+            The day modulus is not included since it depends on the start date 
+            of a search, the actual occurances are a subset of the range.
+        """
+
+        result = self.compile().analysis
+        if result == None: return None
+        return tuple( datetime.date.fromordinal(o) for o in result )
+
+    def is_satisfiable(self):
+        """
+        Test if the interval can ever occur.
+
+        Return:
+            False if the filter values prove there are no occurances.
+        """
+
+        return self.compile().analysis != None
+
+    # ---------------------------
+
+    def contains(self, date):
+        """
+        Test if the given date is an occurance of the interval.
+
+        Parameters: 
+            date - the date to test
+
+        Return:
+            True if the date is an occurance.
+
+        Note: 
+            The day modulus phase is computed arithmetically from the 
+            start_date anchor, the cost doesn't depend on how far the 
+            date is from the anchor. Dates after the anchor agree with 
+            next_occurances() and dates before it with previous_occurances().
+        """
+
+        compiled = self.compile()
+        if compiled.analysis == None: return False
+        return _contains(compiled, date.toordinal(), self.start_date.toordinal())
+
+    def __contains__(self, date):
+        return self.contains(date)
+
+    # ---------------------------
+
+    def count_occurrences(self, start_date=None, end_date=None):
+        """
+        Count the occurances in the given date range, without generating them.
+
+        Parameters: 
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            The number of occurances in the range (int).
+
+        Note: 
+            This is equivalent to len(next_occurances(...)) without a limit 
+            on the number of results. The count is computed from per-month 
+            and per-year counts of the calendar.
+        """
+
+        if end_date == None: end_date = datetime.date(9999,1,1)
+        if start_date == None: start_date = self.start_date
+
+        compiled = self.compile()
+        if compiled.analysis == None: return 0
+
+        result_cnt = _count(compiled, start_date.toordinal(), end_date.toordinal())
+        return _day_mod_count(compiled, result_cnt)
+
+    # ---------------------------
+
+    def nth_occurrence(self, n, start_date=None):
+        """
+        Obtain the n-th next occurance, without generating the prior ones.
+
+        Parameters: 
+            n          - index of the occurance, 1 is the next occurance.
+            start_date - the starting date range, all days prior are ignored.
+
+        Return:
+            the n-th next occurance or None if it doesn't exist.
+
+        Note: 
+            This is equivalent to next_occurances(max_results=n)[n-1]. Whole 
+            years and months are skipped using their occurance counts, only 
+            the final month is indexed.
+        """
+
+        if start_date == None: start_date = self.start_date
+
+        compiled = self.compile()
+        if compiled.analysis == None: return None
+
+        result_cnt = _day_mod_index(compiled, n)
+        if result_cnt == None: return None
+
+        o = _nth(compiled, start_date.toordinal(), result_cnt)
+        if o == None: return None
+        return datetime.date.fromordinal(o)
+
+    # ---------------------------
+
+    def previous(self, start_date=None, end_date=None):
+        """
+        Obtain the previous occurance in the given date range.
+
+        Parameters: 
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            the previous occurance in the given range or None if one didn't occur in the range.
+
+        Note: 
+            This is equivalent to running .previous_occurances with a max_result of 1
+        """
+
+        result_ar = self.previous_occurances(start_date=start_date, end_date=end_date, max_results=1)
+        if len(result_ar) > 0:
+            return result_ar[0]
+        else:
+            return None
+    
+    # ---------------------------
+
+    def previous_occurances(self, start_date=None, end_date=None, max_results=10):
+        """
+        Obtain the previous occurances that occur in the given date range.
+
+        Parameters: 
+            start_date  - the starting date range, all days prior are ignored.
+            end_date    - the ending date range, all days after are ignored.
+            max_results - limit to number of results to find
+        
+        Return:
+            a list of previous occurances in the given range.
+
+        Note: 
+            This function iterates backwards in time from the end_date, the 
+            modulus may not work perfectly here.
+        """
+
+        results = []
+        if max_results < 1: return results
+
+        for prevday in self.iter_previous_occurrences(start_date, end_date):
+            results.append(prevday)
+            if len(results) >= max_results: break
+
+        return results
+
+    # ---------------------------
+
+    def iter_previous_occurrences(self, start_date=None, end_date=None):
+        """
+        Generate the previous occurances, iterating backwards in time from 
+        the end_date.
+
+        Parameters: 
+            start_date  - the starting date range, all days prior are ignored.
+            end_date    - the ending date range, all days after are ignored.
+        
+        Return:
+            a generator of previous occurances in descending order.
+
+        Note: 
+            The day modulus is counted from the end_date backwards, 
+            this matches previous_occurances().
+        """
+
+        if end_date == None:
+            end_date = min( datetime.date.today(), self.start_date )
+        if start_date == None: start_date = datetime.date(2,1,1)
+
+        # narrow the search range to the possible days
+        compiled = self.compile()
+        if compiled.analysis == None: return
+        start_ord = max( start_date.toordinal(), compiled.analysis[0] - 1 )
+
+        result_cnt = 0
+
+        for o in _backward(compiled, end_date.toordinal(), start_ord):
+            result_cnt += 1
+
+            # day_mod is modulated on the resulting days
+            if not _day_mod_match(compiled, result_cnt, reverse=True): continue
+
+            yield datetime.date.fromordinal(o)
+
+    # ----------------------------------------------------------------------
+    
+    def next(self, start_date=None, end_date=None):
+        """
+        Obtain the next occurance in the given date range.
+
+        Parameters: 
+            start_date - the starting date range, all days prior are ignored.
+            end_date   - the ending date range, all days after are ignored.
+
+        Return:
+            the next occurance in the given range or None if one didn't occur in the range.
+
+        Note: 
+            This is equivalent to running .next_occurances with a max_result of 1
+        """
+
+        if start_date == None: start_date = self.start_date
+
+        compiled = self.compile()
+        analysis = compiled.analysis
+        if analysis == None: return None
+        end_ord = min( _default_end if end_date == None else end_date.toordinal(), analysis[1] )
+
+        # the day modulus decides which of the first matching days is the answer
+        if compiled.first_pass == None: return None
+        o = _first(compiled, start_date.toordinal(), end_ord, compiled.first_pass)
+        if o == None: return None
+        return datetime.date.fromordinal(o)
+    
+    # ---------------------------
+
+    def next_occurances(self, start_date=None, end_date=None, max_results=10):
+        """
+        Obtain the next occurances that occur in the given date range.
+
+        Parameters: 
+            start_date  - the starting date range, all days prior are ignored.
+            end_date    - the ending date range, all days after are ignored.
+            max_results - limit to number of results to find
+        
+        Return:
+            a list of next occurances in the given range.
+        """
+
+        if end_date == None: end_date = datetime.date(9999,1,1)
+
+        result = []
+        if max_results < 1: return result
+
+        for curdate in self.iter_occurrences(start_date=start_date, end_date=end_date):
+            result.append(curdate)
+            if len(result) >= max_results: break
+
+        return result
+
+    # ---------------------------
+
+    def iter_occurrences(self, start_date=None, end_date=None):
+        """
+        Generate the next occurances lazily, iterating forward in time from 
+        the start_date.
+
+        Parameters: 
+            start_date  - the starting date range, all days prior are ignored.
+            end_date    - the ending date range, all days after are ignored.
+                          (default=None, no upper bound)
+        
+        Return:
+            a generator of next occurances in ascending order.
+
+        Note: 
+            The day modulus phase is kept for the life of the generator, 
+            so consuming it in pieces (e.g. with itertools.islice) gives 
+            the same results as a single large next_occurances() call.
+        """
+
+        if end_date == None: end_date = datetime.date.max
+        if start_date == None: start_date = self.start_date
+
+        # narrow the search range to the possible days
+        compiled = self.compile()
+        if compiled.analysis == None: return
+        end_ord = min( end_date.toordinal(), compiled.analysis[1] )
+
+        result_cnt = 0
+
+        # the engine skips ahead over the years and months which can't match
+        for o in _forward(compiled, start_date.toordinal(), end_ord):
+            # we matched! 
+            result_cnt += 1
+            
+            # day_mod is a modulated on the resulting days
+            if not _day_mod_match(compiled, result_cnt): continue
+            
+            yield datetime.date.fromordinal(o)
+
+    # -------------------------------------------------
+
+# -------------------------------------------
@@ -0,0 +1,261 @@
+"""
+scheduler.py
+asyncio scheduler calling back on the occurances of specifications.
+
+The next fire time of every schedule is kept in a priority queue (heapq).
+The scheduler sleeps until the earliest one, dispatches the callbacks which
+are due and computes the following fire time of those schedules only. The
+schedules can be added or removed while it runs, which wakes it up to
+recompute the sleep.
+
+The time is read from a clock object, so it can be replaced for testing:
+    now()          - the current datetime
+    sleep(seconds) - awaitable sleeping for the given number of seconds
+
+This module requires python 3 and is not imported by the package.
+"""
+
+import asyncio, datetime, heapq, itertools
+
+# longest step of SystemClock.sleep() in seconds, the system time is read
+# again after each step so its changes (e.g. daylight saving) are followed
+_max_step = 3600.0
+
+# -------------------------------------------
+
+class SystemClock(object):
+    """
+    Clock of the local system time, the default clock of the Scheduler.
+    """
+
+    def now(self):
+        return datetime.datetime.now()
+
+    async def sleep(self, seconds):
+        # asyncio sleeps on the monotonic clock, the deadline is on the system time
+        deadline = self.now() + datetime.timedelta(seconds=seconds)
+        while True:
+            remaining = ( deadline - self.now() ).total_seconds()
+            if remaining <= 0: return
+            await asyncio.sleep( min(remaining, _max_step) )
+
+# -------------------------------------------
+
+class _Schedule(object):
+    """
+    Internal class.
+    A registered specification and the index of its next occurance.
+    """
+    __slots__ = ( 'key', 'spec', 'callback', 'at', 'anchor', 'n', 'fire' )
+
+    def __init__(self, key, spec, callback, at, anchor):
+        self.key      = key
+        self.spec     = spec
+        self.callback = callback
+        self.at       = at
+        self.anchor   = anchor   # start date the occurances are counted from
+        self.n        = 0        # index of the next occurance
+        self.fire     = None     # datetime of the next occurance
+
+    def advance(self, now):
+        """
+        Find the first occurance firing after now, None when there are no
+        more occurances.
+        """
+
+        if self.n == 0:
+            # skip the occurances before today, keeping the day modulus phase
+            yesterday = now.date() - datetime.timedelta(days=1)
+            self.n = self.spec.count_occurrences(self.anchor, yesterday)
+
+        while True:
+            self.n += 1
+            date = self.spec.nth_occurrence(self.n, start_date=self.anchor)
+            if date == None:
+                self.fire = None
+                return None
+            self.fire = datetime.datetime.combine(date, self.at)
+            if self.fire > now: return self.fire
+
+# -------------------------------------------
+
+class Scheduler(object):
+    """
+    asyncio scheduler dispatching callbacks on the occurances of date
+    interval specifications (DateIntervalSpec or CompactSpec).
+
+    Parameters:
+        clock - the clock to use (default=SystemClock())
+
+    For example:
+        scheduler = Scheduler()
+        scheduler.add('report', DateIntervalSpec.from_phrase('every monday'), send_report,
+                      at=datetime.time(9, 0))
+        await scheduler.run()
+
+    Notes:
+        * The callbacks are called as callback(key, date), coroutines are
+          run as tasks so a slow callback doesn't delay the others.
+        * The schedules must be added and removed from the thread of the
+          event loop, see loop.call_soon_threadsafe().
+    """
+    def __init__(self, clock=None):
+        self.clock = clock if clock != None else SystemClock()
+
+        self._schedules = {}                # key --> _Schedule
+        self._queue     = []                # ( fire, seq, _Schedule )
+        self._seq       = itertools.count() # ties in the order of addition
+        self._tasks     = set()             # running coroutine callbacks
+        self._wakeup    = None
+        self._running   = False
+
+    # ---------------------------
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def __contains__(self, key):
+        return key in self._schedules
+
+    def add(self, key, spec, callback, at=None):
+        """
+        Register a specification, replacing the schedule of the same key.
+
+        Parameters:
+            key      - key of the schedule, passed to the callback
+            spec     - the specification of the occurances
+            callback - function or coroutine function called as callback(key, date)
+            at       - time of the day of the occurances (default=midnight)
+
+        Return:
+            the datetime of the first occurance or None if it never fires.
+
+        Note:
+            The occurances are counted from the start_date of the
+            specification, the ones which are already past are skipped.
+        """
+
+        if at == None: at = datetime.time(0)
+
+        schedule = _Schedule(key, spec, callback, at, spec.start_date)
+        self._schedules[key] = schedule
+        self._push(schedule, self.clock.now())
+        self._wake()
+        return schedule.fire
+
+    def remove(self, key):
+        """
+        Unregister the schedule of a key.
+        """
+
+        del self._schedules[key]
+        self._wake()
+
+    def next_fire(self):
+        """
+        Obtain the earliest pending occurance.
+
+        Return:
+            a 2-tuple of ( datetime, key ) or None if nothing is scheduled.
+        """
+
+        self._discard_stale()
+        if len(self._queue) == 0: return None
+        fire, seq, schedule = self._queue[0]
+        return ( fire, schedule.key )
+
+    # ---------------------------
+
+    def _push(self, schedule, now):
+        """
+        Internal function.
+        Queue the next occurance of a schedule, dropping it when it has no
+        more occurances.
+        """
+
+        if schedule.advance(now) == None:
+            if self._schedules.get(schedule.key) is schedule: del self._schedules[schedule.key]
+            return
+        heapq.heappush( self._queue, (schedule.fire, next(self._seq), schedule) )
+
+    def _discard_stale(self):
+        """
+        Internal function.
+        Pop the queued occurances of removed or replaced schedules.
+        """
+
+        while len(self._queue) > 0:
+            schedule = self._queue[0][2]
+            if self._schedules.get(schedule.key) is schedule: break
+            heapq.heappop(self._queue)
+
+    def _wake(self):
+        """
+        Internal function.
+        Interrupt the sleep of run() so the next fire time is recomputed.
+        """
+
+        if self._wakeup != None: self._wakeup.set()
+
+    def _dispatch(self, now):
+        """
+        Internal function.
+        Call the callbacks of every occurance due at the given time.
+        """
+
+        while True:
+            self._discard_stale()
+            if len(self._queue) == 0 or self._queue[0][0] > now: return
+
+            fire, seq, schedule = heapq.heappop(self._queue)
+            try:
+                result = schedule.callback(schedule.key, fire.date())
+                if asyncio.iscoroutine(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                asyncio.get_event_loop().call_exception_handler({
+                    'message': 'Exception in the callback of schedule %r' % (schedule.key,),
+                    'exception': e })
+
+            self._push(schedule, now)
+
+    # ---------------------------
+
+    async def run(self):
+        """
+        Dispatch the callbacks until stop() is called.
+        """
+
+        self._wakeup = asyncio.Event()
+        self._running = True
+        try:
+            while self._running:
+                self._wakeup.clear()
+                now = self.clock.now()
+                self._dispatch(now)
+
+                # sleep until the next occurance or a change of the schedules
+                waiter = asyncio.ensure_future( self._wakeup.wait() )
+                waits = [ waiter ]
+                upcoming = self.next_fire()
+                if upcoming != None:
+                    delay = ( upcoming[0] - now ).total_seconds()
+                    waits.append( asyncio.ensure_future( self.clock.sleep( max(delay, 0.0) ) ) )
+
+                done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending: task.cancel()
+        finally:
+            self._running = False
+            self._wakeup = None
+
+    def stop(self):
+        """
+        Stop run() after the callbacks currently due are dispatched.
+        """
+
+        self._running = False
+        self._wake()
+
+# -------------------------------------------
@@ -0,0 +1,304 @@
+"""
+scheduleset.py
+Inverted index of many specifications, answering which of them occur on a
+given date.
+
+Every specification is given a slot and the slots are kept in posting sets
+per filter value:
+    dow   - day of the week (0-6)
+    dom   - day of the month (1-31)
+    week  - week of the month, (day - 1) / 7 as in the engine (0-4)
+    month - month (1-12), combining month_indx and the month modulus
+    year  - year modulus groups and year indices
+Specifications without a filter are in the "any" posting of that filter.
+
+The postings are turned into integer bitmaps on first use, so a query is a
+few bitwise AND / OR of the bitmaps of the date's values. Only the day
+modulus, which depends on the start_date anchor, is confirmed by the
+engine, on the specifications passing every other filter.
+
+The postings are built from the filter values, the specifications are not
+compiled when they are set. The specifications with the same filters share
+a single form, holding the filters, their postings and the compiled form
+used for the day modulus, which is only built when a query needs it.
+"""
+
+from collections import namedtuple
+from .engine import _CompiledSpec, _contains, _filter_names, _month_candidates
+
+# snapshot of the filter values of a specification
+_Filters = namedtuple('_Filters', _filter_names)
+
+# -------------------------------------------
+
+def _to_bitmap( slots ):
+    """
+    Internal function.
+    Convert a set of slots to an integer bitmap, bit i set for slot i.
+    """
+
+    if len(slots) == 0: return 0
+
+    digits = ['0'] * ( max(slots) + 1 )
+    for i in slots: digits[-1 - i] = '1'
+    return int( ''.join(digits), 2 )
+
+# -------------------------------------------
+
+def _bit_positions( bits ):
+    """
+    Internal function.
+    Generate the positions of the set bits of an integer bitmap, in
+    ascending order.
+    """
+
+    # bit i is at index i of the reversed binary digits
+    digits = bin(bits)[:1:-1]
+    i = digits.find('1')
+    while i >= 0:
+        yield i
+        i = digits.find('1', i + 1)
+
+# -------------------------------------------
+
+def _year_match( filters, year ):
+    """
+    Internal function.
+    Test the year filters of a specification with year indices on a year.
+    """
+
+    if year not in filters.year_indx: return False
+    return filters.year_mod == None or year % filters.year_mod == filters.year_mod_val
+
+# -------------------------------------------
+
+class ScheduleSet(object):
+    """
+    Mapping of keys to date interval specifications (DateIntervalSpec or
+    CompactSpec), indexed to find the specifications occurring on a date.
+
+    For example:
+        schedules = ScheduleSet()
+        schedules['standup'] = DateIntervalSpec.from_phrase('every weekday')
+        schedules['review']  = DateIntervalSpec.from_phrase('every friday')
+        schedules.matching(datetime.date(2022,1,7)) --> ['standup', 'review']
+
+    Notes:
+        * The filters are indexed when a specification is set, later changes
+          to a DateIntervalSpec require setting it again.
+        * The cost of the bitmap operations is linear in the number of
+          specifications but done a machine word at a time, the rest of a
+          query is linear in the number of matching specifications.
+    """
+    def __init__(self, schedules=None):
+        self._slots    = {}   # key --> slot
+        self._entries  = []   # slot --> ( key, spec, form ) or None
+        self._forms    = {}   # filters --> [ filters, postings, compiled, number of slots ]
+        self._free     = []   # unused slots
+        self._postings = {}   # ( filter, value ) --> set of slots
+        self._bitmaps  = {}   # ( filter, value ) --> bitmap of the posting
+        self._years    = {}   # year --> bitmap of the year indexed slots
+
+        if schedules != None: self.update(schedules)
+
+    # ---------------------------
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def __getitem__(self, key):
+        return self._entries[ self._slots[key] ][1]
+
+    def __setitem__(self, key, spec):
+        if key in self._slots: del self[key]
+
+        filters = []
+        for name in _filter_names:
+            value = getattr(spec, name)
+            if isinstance(value, (set, list, tuple)): value = frozenset(value)
+            filters.append(value)
+        filters = _Filters(*filters)
+
+        form = self._forms.get(filters)
+        if form == None:
+            form = self._forms[filters] = [ filters, self._postings_of(filters), None, 0 ]
+        form[3] += 1
+
+        slot = self._free.pop() if len(self._free) > 0 else len(self._entries)
+        if slot == len(self._entries): self._entries.append(None)
+
+        self._entries[slot] = ( key, spec, form )
+        self._slots[key] = slot
+        for posting in form[1]:
+            self._postings.setdefault(posting, set()).add(slot)
+            self._changed(posting)
+
+    def __delitem__(self, key):
+        slot = self._slots.pop(key)
+        form = self._entries[slot][2]
+
+        self._entries[slot] = None
+        self._free.append(slot)
+        for posting in form[1]:
+            self._postings[posting].discard(slot)
+            self._changed(posting)
+
+        form[3] -= 1
+        if form[3] == 0: del self._forms[form[0]]
+
+    def items(self):
+        """
+        Obtain the ( key, spec ) pairs of the set.
+        """
+
+        return [ self._entries[slot][:2] for slot in self._slots.values() ]
+
+    def update(self, schedules):
+        """
+        Set many specifications at once.
+
+        Parameters:
+            schedules - mapping or iterable of ( key, spec ) pairs
+        """
+
+        if hasattr(schedules, 'items'): schedules = schedules.items()
+        for key, spec in schedules:
+            self[key] = spec
+
+    # ---------------------------
+
+    def _postings_of(self, filters):
+        """
+        Internal function.
+        Obtain the postings ( filter, value ) of the filters of a specification.
+        The filters which can never pass leave the specification out of the 
+        postings of a kind, so it never matches.
+        """
+
+        postings = []
+        for name, values, lo, hi in ( ('dow', filters.dow, 0, 6), ('dom', filters.dom, 1, 31) ):
+            if values == None:
+                postings.append( (name, None) )
+            else:
+                # values out of range never match
+                postings.extend( (name, x) for x in values if lo <= x <= hi )
+
+        postings.append( ('week', filters.week_indx) )
+
+        months = _month_candidates(filters)
+        if len(months) == 12:
+            postings.append( ('month', None) )
+        else:
+            postings.extend( ('month', m) for m in months )
+
+        if filters.year_indx != None:
+            postings.append( ('year_indx', None) )
+        elif filters.year_mod != None:
+            postings.append( ('year_mod', (filters.year_mod, filters.year_mod_val)) )
+        else:
+            postings.append( ('year', None) )
+
+        # a modulus of 1 with a phase of 0 passes every count
+        if filters.day_mod != None and ( filters.day_mod, filters.day_mod_val ) != (1, 0):
+            postings.append( ('day_mod', None) )
+
+        return tuple(postings)
+
+    def _compiled(self, form):
+        """
+        Internal function.
+        Obtain the compiled form of shared filters, built on first use.
+        """
+
+        compiled = form[2]
+        if compiled == None: compiled = form[2] = _CompiledSpec(form[0])
+        return compiled
+
+    def _changed(self, posting):
+        """
+        Internal function.
+        Drop the bitmaps built from a posting that changed.
+        """
+
+        self._bitmaps.pop(posting, None)
+        if posting[0] == 'year_indx': self._years.clear()
+        if len(self._postings[posting]) == 0: del self._postings[posting]
+
+    # ---------------------------
+
+    def _bitmap(self, name, value):
+        """
+        Internal function.
+        Obtain the bitmap of a posting, built on first use.
+        """
+
+        posting = ( name, value )
+        bits = self._bitmaps.get(posting)
+        if bits == None:
+            bits = self._bitmaps[posting] = _to_bitmap( self._postings.get(posting, ()) )
+        return bits
+
+    def _year_bitmap(self, year):
+        """
+        Internal function.
+        Obtain the bitmap of the slots passing the year filters of a year.
+        """
+
+        bits = self._bitmap('year', None)
+
+        for name, value in self._postings:
+            if name == 'year_mod' and year % value[0] == value[1]:
+                bits |= self._bitmap(name, value)
+
+        # the year indices are tested once per year
+        indexed = self._years.get(year)
+        if indexed == None:
+            slots = self._postings.get( ('year_indx', None), () )
+            indexed = self._years[year] = _to_bitmap( [ i for i in slots
+                                                        if _year_match(self._entries[i][2][0], year) ] )
+        return bits | indexed
+
+    # ---------------------------
+
+    def matching(self, date):
+        """
+        Obtain the keys of the specifications occurring on a date, see
+        DateIntervalSpec.contains().
+
+        Parameters:
+            date - the date to test
+
+        Return:
+            A list of the keys, in the order of their slots.
+        """
+
+        day = date.day
+        week = ( day - 1 ) // 7
+
+        bits = self._bitmap('dow', date.weekday()) | self._bitmap('dow', None)
+        if bits: bits &= self._bitmap('dom', day) | self._bitmap('dom', None)
+        if bits: bits &= self._bitmap('week', week) | self._bitmap('week', None)
+        if bits: bits &= self._bitmap('month', date.month) | self._bitmap('month', None)
+        if bits: bits &= self._year_bitmap(date.year)
+
+        # the day modulus is confirmed from the anchor of each specification
+        confirm = set( _bit_positions(bits & self._bitmap('day_mod', None)) )
+        o = date.toordinal()
+
+        result = []
+        for i in _bit_positions(bits):
+            key, spec, form = self._entries[i]
+            if i in confirm:
+                compiled = self._compiled(form)
+                if compiled.analysis == None: continue
+                if not _contains(compiled, o, spec.start_date.toordinal()): continue
+            result.append(key)
+        return result
+
+# -------------------------------------------
@@ -0,0 +1,89 @@
+"""
+startup.py
+Instrumentation of the startup cost of the package.
+
+The time from "import semsched" to the first parsed specification is
+measured in a fresh interpreter, so nothing is already imported, compiled
+or cached:
+    import_time       - import of the package
+    first_parse_time  - first DateIntervalSpec.from_phrase(), which compiles
+                        the parsing patterns and fills the parse cache
+    cached_parse_time - the same phrase again, served by the parse cache
+
+Run as a script to print a report:
+    python -m semsched.startup ["phrase"] [repeat]
+"""
+
+import os, sys, subprocess
+from collections import namedtuple
+
+# timings in seconds, as returned by measure_startup()
+StartupReport = namedtuple('StartupReport', ('import_time', 'first_parse_time', 'cached_parse_time'))
+
+# script run by the fresh interpreter, prints the three timings
+_probe = '''
+import sys, time
+clock = getattr(time, 'perf_counter', time.time)
+t0 = clock()
+import semsched
+t1 = clock()
+semsched.DateIntervalSpec.from_phrase(sys.argv[1])
+t2 = clock()
+semsched.DateIntervalSpec.from_phrase(sys.argv[1])
+t3 = clock()
+sys.stdout.write('%r %r %r' % (t1 - t0, t2 - t1, t3 - t2))
+'''
+
+# -------------------------------------------
+
+def _probe_once( phrase ):
+    """
+    Internal function.
+    Run the probe script once in a fresh interpreter.
+
+    Return:
+        A tuple of (import_time, first_parse_time, cached_parse_time).
+    """
+
+    # the fresh interpreter imports this copy of the package
+    env = dict(os.environ)
+    path = os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) )
+    env['PYTHONPATH'] = os.pathsep.join( [path] + [ x for x in [env.get('PYTHONPATH')] if x ] )
+
+    output = subprocess.check_output( [sys.executable, '-c', _probe, phrase], env=env )
+    return tuple( float(x) for x in output.split() )
+
+# -------------------------------------------
+
+def measure_startup( phrase='every monday', repeat=5 ):
+    """
+    Measure the startup cost of the package in fresh interpreters.
+
+    Parameters:
+        phrase - phrase of the first parse (default='every monday')
+        repeat - number of interpreters to run, the median of each timing
+                 is reported (default=5)
+
+    Return:
+        A StartupReport of the timings, in seconds.
+    """
+
+    if repeat < 1: raise ValueError('repeat must be at least 1.')
+
+    runs = [ _probe_once(phrase) for i in range(repeat) ]
+    medians = [ sorted(x)[ len(x) // 2 ] for x in zip(*runs) ]
+    return StartupReport(*medians)
+
+# -------------------------------------------
+
+if __name__ == '__main__':
+    phrase = sys.argv[1] if len(sys.argv) > 1 else 'every monday'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    report = measure_startup(phrase, repeat)
+    print('phrase:             %r' % phrase)
+    print('import time:        %.2f ms' % ( 1000 * report.import_time ))
+    print('first parse time:   %.2f ms' % ( 1000 * report.first_parse_time ))
+    print('cached parse time:  %.3f ms' % ( 1000 * report.cached_parse_time ))
+
+# -------------------------------------------
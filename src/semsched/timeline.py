@@ -0,0 +1,60 @@
+"""
+timeline.py
+Occurances of many specifications merged into a single timeline.
+
+Every specification is advanced lazily by its own iter_occurrences()
+generator, the cursor, and a heap holds the next occurance of each one.
+The memory is proportional to the number of specifications and each
+occurance is emitted with a single heap operation, O(log n).
+"""
+
+import heapq
+
+# -------------------------------------------
+
+def iter_timeline( schedules, start_date=None, end_date=None ):
+    """
+    Generate the occurances of many specifications in time order.
+
+    Parameters:
+        schedules  - mapping of key --> specification (e.g. a ScheduleSet) or
+                     iterable of specifications, keyed by their position
+        start_date - the starting date range, all days prior are ignored
+                     (default=the start_date of each specification)
+        end_date   - the ending date range, all days after are ignored
+                     (default=None, no upper bound)
+
+    Return:
+        a generator of ( date, key ) in ascending order of the dates, the
+        occurances on the same date are in the order of the schedules.
+
+    For example:
+        itertools.islice( iter_timeline(schedules), 1000 ) --> next 1000 events
+    """
+
+    if hasattr(schedules, 'items'):
+        schedules = schedules.items()
+    else:
+        schedules = enumerate(schedules)
+
+    # ( next occurance, position, key, cursor ), the position breaks the ties
+    heap = []
+    for i, (key, spec) in enumerate(schedules):
+        cursor = spec.iter_occurrences(start_date=start_date, end_date=end_date)
+        for date in cursor:
+            heap.append( (date, i, key, cursor) )
+            break
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        date, i, key, cursor = heap[0]
+        yield ( date, key )
+
+        # advance the cursor which was just emitted
+        for date in cursor:
+            heapq.heapreplace( heap, (date, i, key, cursor) )
+            break
+        else:
+            heapq.heappop(heap)
+
+# -------------------------------------------
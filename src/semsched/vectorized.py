@@ -0,0 +1,161 @@
+"""
+vectorized.py
+Optional NumPy evaluation of a DateIntervalSpec over a whole date range.
+
+All filters of the specification are turned into a single boolean mask
+over a datetime64[D] array. The day modulus is applied as a modulus on
+the cumulative count of matching days, as done by next_occurances().
+
+NumPy is not required by the package. occurrences_between() returns a
+datetime64[D] array, which needs NumPy, or a list of dates with
+as_array=False, which falls back on the pure python engine without it.
+"""
+
+import datetime
+from .intervals import IntervalSet
+
+# cached reference to the numpy module, False if it is not available
+_np = None
+
+# -------------------------------------------------
+
+def _numpy():
+    """
+    Internal function.
+    Import numpy on first use.
+
+    Return:
+        The numpy module or None if it isn't installed.
+    """
+
+    global _np
+    if _np == None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+
+    return _np or None
+
+# -------------------------------------------------
+
+def occurrence_mask( dint, dates ):
+    """
+    Evaluate the filters of a specification over an array of days.
+
+    Parameters:
+        dint  - DateIntervalSpec compatible instance to evaluate
+        dates - array of days (datetime64[D] or convertible to it)
+
+    Return:
+        A boolean numpy array, True where the day is an occurance.
+
+    Notes:
+        * The day modulus counts the matching days in the order of the
+          given array. Pass consecutive ascending days, starting the day
+          after the start date, to reproduce next_occurances().
+        * Raises ImportError if numpy isn't available.
+    """
+
+    np = _numpy()
+    if np == None:
+        raise ImportError('numpy is required for occurrence_mask().')
+
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    months = dates.astype('datetime64[M]')
+
+    # decompose the days, 1970-01-01 was a Thursday (3)
+    year  = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day   = ( dates - months ).astype(np.int64) + 1
+    dow   = ( dates.astype(np.int64) + 3 ) % 7
+
+    mask = np.ones(dates.shape, dtype=bool)
+
+    # year filtering
+    if dint.year_indx != None:
+        # bisect the year into the intervals of the year indices
+        years = dint.year_indx
+        if not isinstance(years, IntervalSet): years = IntervalSet(years)
+        if len(years) < 1:
+            mask[:] = False
+        else:
+            first, last = np.array(years.intervals, dtype=np.int64).T
+            i = np.searchsorted(first, year, side='right') - 1
+            mask &= ( i >= 0 ) & ( year <= last[np.maximum(i, 0)] )
+    if dint.year_mod != None:
+        mask &= ( year % dint.year_mod ) == dint.year_mod_val
+
+    # month filtering
+    if dint.month_indx != None:
+        mask &= month == dint.month_indx
+    if dint.month_mod != None:
+        mask &= ( month % dint.month_mod ) == dint.month_mod_val
+
+    # day filtering
+    if dint.dow != None:
+        mask &= np.isin(dow, sorted(dint.dow))
+    if dint.dom != None:
+        mask &= np.isin(day, sorted(dint.dom))
+    if dint.week_indx != None:
+        mask &= ( day - 1 ) // 7 == dint.week_indx
+
+    # day_mod is modulated on the cumulative count of matching days
+    if dint.day_mod != None:
+        result_cnt = np.cumsum(mask)
+        if dint.dow == None:
+            # no specific day
+            mask &= ( result_cnt % dint.day_mod ) == dint.day_mod_val
+        elif dint.dow == {0,1,2,3,4,}:
+            # weekday case
+            mask &= ( (result_cnt - 1) % dint.day_mod ) == dint.day_mod_val
+        else:
+            # week / weekend, ignoring the first repeat
+            repeat = ( result_cnt - 1 ) // len(dint.dow)
+            mask &= ( repeat % dint.day_mod ) == dint.day_mod_val
+            if dint.day_mod > 1: mask &= repeat >= 1
+
+    return mask
+
+# -------------------------------------------------
+
+def occurrences_between( dint, start_date=None, end_date=None, as_array=True ):
+    """
+    Obtain every occurance in the given date range.
+
+    Parameters:
+        dint       - DateIntervalSpec compatible instance to evaluate
+        start_date - the starting date range, exclusive (default=dint.start_date)
+        end_date   - the ending date range, inclusive (default=Dec 31, 9999)
+        as_array   - return a numpy array rather than a list (default=True)
+
+    Return:
+        The occurances in ascending order, a datetime64[D] numpy array or 
+        with as_array=False a list of dates.
+
+    Notes:
+        * The results are the same as next_occurances() without a limit
+          on the number of results.
+        * Raises ImportError if numpy isn't available and as_array is True.
+          The list is computed by the pure python engine without numpy.
+    """
+
+    if start_date == None: start_date = dint.start_date
+    if end_date == None: end_date = datetime.date.max
+
+    np = _numpy()
+    if np == None:
+        if as_array: raise ImportError('numpy is required for occurrences_between(), see as_array.')
+        return list( dint.iter_occurrences(start_date=start_date, end_date=end_date) )
+
+    if start_date >= end_date:
+        dates = np.array([], dtype='datetime64[D]')
+    else:
+        dates = np.arange( np.datetime64(start_date, 'D') + 1, np.datetime64(end_date, 'D') + 1 )
+        dates = dates[ occurrence_mask(dint, dates) ]
+
+    if as_array: return dates
+    return dates.tolist()
+
+# -------------------------------------------------
@@ -1,5 +1,5 @@
 import pytest, sys, os
-import datetime
+import datetime, itertools
 
 # include ../src in the path search
 mypath = os.path.dirname( os.path.realpath(__file__) )
@@ -112,4 +112,638 @@ def test_overall():
 
     for i in range(9):
         assert( (days_p[i+1] - days_p[i]).days == 2 )
-        assert( (days_m[i] - days_m[i+1]).days == 2 )   
\ No newline at end of file
+        assert( (days_m[i] - days_m[i+1]).days == 2 )   
+
+def test_sparse_schedules():
+    f = lib.DateIntervalSpec.from_phrase
+
+    # a single day many years out
+    s = f('first friday of feb 2031'); s.start_date = datetime.date(2022,1,1)
+    assert( s.next() == datetime.date(2031,2,7) )
+    assert( s.next_occurances() == [datetime.date(2031,2,7)] )
+    assert( s.next(start_date=datetime.date(2031,2,7)) == None )
+
+    # every other feb, only the 1st
+    s = f('1st day of every other feb'); s.start_date = datetime.date(2022,1,1)
+    assert( s.next_occurances(max_results=3) == 
+            [datetime.date(2022,2,1), datetime.date(2024,2,1), datetime.date(2026,2,1)] )
+
+    # every monday within a year range
+    s = f('every monday in 2022 to 2023'); s.start_date = datetime.date(2020,1,1)
+    days = s.next_occurances(max_results=200)
+    assert( len(days) == 104 )
+    assert( days[0] == datetime.date(2022,1,3) and days[-1] == datetime.date(2023,12,25) )
+
+def test_month_day_candidates():
+    f = lib.DateIntervalSpec.from_phrase
+
+    # nth weekday of the month
+    s = f('second tuesday of every month'); s.start_date = datetime.date(2022,1,1)
+    assert( s.next_occurances(max_results=4) == 
+            [datetime.date(2022,1,11), datetime.date(2022,2,8), datetime.date(2022,3,8), datetime.date(2022,4,12)] )
+    assert( s.previous() == datetime.date(2021,12,14) )
+
+    # a fifth week only exists in some months
+    s = f('5th friday of every month'); s.start_date = datetime.date(2022,1,1)
+    assert( s.next_occurances(max_results=3) == 
+            [datetime.date(2022,4,29), datetime.date(2022,7,29), datetime.date(2022,9,30)] )
+
+    # day of month range, clipped by the month length
+    s = f(''); s.start_date = datetime.date(2022,2,1)
+    s.dom = { x for x in range(27,32) }
+    days = s.next_occurances(max_results=7)
+    assert( days[:3] == [datetime.date(2022,2,27), datetime.date(2022,2,28), datetime.date(2022,3,27)] )
+    assert( days[-1] == datetime.date(2022,3,31) )
+
+def test_reverse_iteration():
+    f = lib.DateIntervalSpec.from_phrase
+
+    s = f('first friday of feb 2031'); s.start_date = datetime.date(2040,1,1)
+    assert( s.previous(end_date=datetime.date(2040,1,1)) == datetime.date(2031,2,7) )
+    assert( s.previous(end_date=datetime.date(2031,2,7)) == None )
+
+    # the last day of the last year is included
+    s = f('every day in 2022'); s.start_date = datetime.date(2024,1,1)
+    assert( s.previous(end_date=datetime.date(2024,1,1)) == datetime.date(2022,12,31) )
+
+    # the generator matches the list version
+    s = f('every other saturday'); s.start_date = datetime.date(2022,1,1)
+    days = s.previous_occurances(end_date=s.start_date, max_results=50)
+    gen = s.iter_previous_occurrences(end_date=s.start_date)
+    assert( days == [ next(gen) for i in range(50) ] )
+    for i in range(49):
+        assert( (days[i] - days[i+1]).days == 14 )
+
+    # the date range is given in the same order as previous_occurances()
+    gen = s.iter_previous_occurrences(datetime.date(2021,1,1), s.start_date)
+    assert( list(gen) == s.previous_occurances(datetime.date(2021,1,1), s.start_date, 100) )
+
+def test_lazy_iteration():
+    f = lib.DateIntervalSpec.from_phrase
+
+    s = f('every third day'); s.start_date = datetime.date(2022,1,1)
+    gen = s.iter_occurrences()
+
+    # consuming in pieces keeps the modulus phase
+    days = list(itertools.islice(gen, 5)) + list(itertools.islice(gen, 95))
+    assert( days == s.next_occurances(max_results=100) )
+    assert( days[0] == datetime.date(2022,1,4) )
+
+    # no upper bound by default
+    s = f('25th of dec'); s.start_date = datetime.date(9990,1,1)
+    days = list(s.iter_occurrences())
+    assert( len(days) == 10 and days[-1] == datetime.date(9999,12,25) )
+
+def test_vectorized():
+    f = lib.DateIntervalSpec.from_phrase
+    start, end = datetime.date(2022,1,1), datetime.date(2030,12,31)
+
+    for phrase in ('every other saturday', 'second tuesday of every month', 'every third day', 
+                   'every weekday', '1st day of every other feb', 'every monday in 2022 to 2023'):
+        s = f(phrase); s.start_date = start
+        expected = list(s.iter_occurrences(end_date=end))
+
+        # pure python fallback
+        _np = lib.vectorized._np
+        lib.vectorized._np = False
+        try:
+            assert( lib.occurrences_between(s, end_date=end, as_array=False) == expected )
+            with pytest.raises(ImportError):
+                lib.occurrences_between(s, end_date=end)
+        finally:
+            lib.vectorized._np = _np
+
+        if lib.vectorized._numpy() == None: continue
+        days = lib.occurrences_between(s, end_date=end)
+        assert( days.dtype == 'datetime64[D]' and days.tolist() == expected )
+        assert( lib.occurrences_between(s, end_date=end, as_array=False) == expected )
+
+def test_month_tables():
+    from semsched.engine import _month_table
+
+    for year in (1, 1900, 2000, 2022, 2024, 9999):
+        table = _month_table(year)
+        assert( len(table) == 13 )
+        for m in range(1,13):
+            assert( table[m-1] == datetime.date(year, m, 1).toordinal() )
+        assert( table[12] - table[0] == (366 if year in (2000, 2024) else 365) )
+
+def test_contains():
+    f = lib.DateIntervalSpec.from_phrase
+
+    s = f('second tuesday of every month'); s.start_date = datetime.date(2022,1,1)
+    assert( datetime.date(2022,2,8) in s )
+    assert( not datetime.date(2022,2,15) in s )
+
+    # the day modulus phase is counted from the anchor in both directions
+    s = f('every third day'); s.start_date = datetime.date(2022,1,1)
+    for d in s.next_occurances(max_results=20) + s.previous_occurances(max_results=20):
+        assert( s.contains(d) )
+    assert( not s.contains(datetime.date(2022,1,5)) )
+
+    # far from the anchor
+    assert( s.contains(datetime.date(2022,1,1) + datetime.timedelta(days=3 * 500000)) )
+    assert( not s.contains(datetime.date(2022,1,1) + datetime.timedelta(days=3 * 500000 + 1)) )
+
+    s = f('every other saturday'); s.start_date = datetime.date(2022,1,1)
+    days = s.next_occurances(max_results=200)
+    assert( s.contains(days[-1]) )
+    assert( not s.contains(days[-1] - datetime.timedelta(days=7)) )
+
+def test_count_occurrences():
+    f = lib.DateIntervalSpec.from_phrase
+    start, end = datetime.date(2024,12,31), datetime.date(2035,12,31)
+
+    for phrase in ('every day', 'every other saturday', 'second tuesday of every month', 
+                   'every weekday', 'every third day', '1st day of every other feb'):
+        s = f(phrase)
+        days = s.next_occurances(start_date=start, end_date=end, max_results=10000)
+        assert( s.count_occurrences(start, end) == len(days) )
+
+    s = f('every day')
+    assert( s.count_occurrences(datetime.date(2000,12,31), datetime.date(2400,12,31)) == 146097 )
+    assert( s.count_occurrences(end, start) == 0 )
+
+def test_nth_occurrence():
+    f = lib.DateIntervalSpec.from_phrase
+    start = datetime.date(2022,1,1)
+
+    for phrase in ('every other saturday', 'second tuesday of every month', 'every weekday', 
+                   'every third day', '1st day of every other feb', 'every monday in 2022 to 2023'):
+        s = f(phrase); s.start_date = start
+        days = s.next_occurances(max_results=500)
+        for n in (1, 2, 17, 104, 105, 500):
+            assert( s.nth_occurrence(n) == (days[n-1] if n <= len(days) else None) )
+
+    # crossing several 400 year periods
+    s = f('every day'); s.start_date = start
+    assert( s.nth_occurrence(3 * 146097 + 5) == start + datetime.timedelta(days=3 * 146097 + 5) )
+
+    s = f('every other saturday'); s.start_date = start
+    day = s.nth_occurrence(5000)
+    assert( s.count_occurrences(start, day) == 5000 and s.contains(day) )
+
+def test_cycle_table():
+    f = lib.DateIntervalSpec.from_phrase
+    start = datetime.date(2022,1,1)
+
+    for phrase in ('every other saturday', 'second tuesday of every month', 'every third day', 
+                   '1st day of every other feb', '25th of dec'):
+        s = f(phrase); s.start_date = start
+        t = s.to_cycle()
+        for d in (datetime.date(1999,3,4), start, datetime.date(2100,12,31)):
+            assert( t.next(start_date=d) == s.next(start_date=d) )
+            assert( t.previous(end_date=d) == s.previous(end_date=d) )
+            assert( t.count(d, d + datetime.timedelta(days=5000)) == 
+                    s.count_occurrences(d, d + datetime.timedelta(days=5000)) )
+        for d in s.next_occurances(max_results=20) + s.previous_occurances(max_results=20):
+            assert( d in t )
+
+    t = f('every day').to_cycle()
+    assert( len(t) == 146097 and t.period_years == 400 )
+    assert( f('every other feb').to_cycle().period_years == 400 )
+    assert( f('every 3 years').to_cycle().period_years == 1200 )
+
+    with pytest.raises(ValueError):
+        f('every monday in 2022').to_cycle()
+
+def test_unsatisfiable():
+    f = lib.DateIntervalSpec.from_phrase
+
+    s = f('31st of feb'); s.start_date = datetime.date(2022,1,1)
+    assert( not s.is_satisfiable() and s.possible_range() == None )
+    assert( s.next_occurances() == [] and s.previous_occurances() == [] )
+    assert( s.count_occurrences() == 0 and s.nth_occurrence(1) == None )
+
+    # no 5th monday in Feb of the given years
+    s = f('5th monday of feb in 2022 to 2023')
+    assert( not s.is_satisfiable() )
+
+    # leap days only in years with the right phase
+    s = f('29th of feb')
+    assert( s.possible_range() == (datetime.date(4,2,29), datetime.date(9996,2,29)) )
+    s.year_mod = 4; s.year_mod_val = 1
+    assert( not s.is_satisfiable() )
+
+    # the last possible match bounds the search
+    s = f('5th monday of every month in 2022')
+    assert( s.possible_range() == (datetime.date(2022,1,31), datetime.date(2022,10,31)) )
+    assert( len(s.next_occurances(start_date=datetime.date(2021,1,1))) == 4 )
+
+    # the analysis is done by the first query, not by the parsing
+    s = lib.DateIntervalSpec('31st of feb')
+    assert( s._compiled == None and s.compile()._analysis is False )
+    assert( not s.is_satisfiable() and s.compile()._analysis == None )
+
+def test_compile():
+    f = lib.DateIntervalSpec.from_phrase
+
+    s = f('every monday'); s.start_date = datetime.date(2022,1,1)
+    c = s.compile()
+    assert( s.compile() is c and type(s.dow) is set )
+
+    # assigning a filter invalidates the compiled form
+    s.dow = {1}
+    assert( s.compile() is not c and type(s.dow) is set )
+    assert( s.next() == datetime.date(2022,1,4) )
+
+    # so does changing a set in place
+    c = s.compile()
+    s.dow.add(2)
+    assert( s.compile() is not c and s.next_occurances(max_results=2) == [ datetime.date(2022,1,4), datetime.date(2022,1,5) ] )
+    s.dow.discard(2)
+    assert( s.next_occurances(max_results=2) == [ datetime.date(2022,1,4), datetime.date(2022,1,11) ] )
+
+    s.month_indx = 3
+    assert( s.next() == datetime.date(2022,3,1) )
+    assert( s.count_occurrences(end_date=datetime.date(2023,1,1)) == 5 )
+
+    # other attributes keep the compiled form
+    c = s.compile()
+    s.start_date = datetime.date(2023,1,1)
+    assert( s.compile() is c and s.next() == datetime.date(2023,3,7) )
+
+    # pickles without the compiled form, which is rebuilt on first use
+    import pickle
+    t = pickle.loads(pickle.dumps(s))
+    assert( s._compiled != None and t._compiled == None )
+    assert( t.phrase == s.phrase and t.start_date == s.start_date and t.month_indx == 3 )
+    assert( t.next_occurances() == s.next_occurances() )
+
+def test_compact_spec():
+    import pickle
+    f = lib.DateIntervalSpec.from_phrase
+    start = datetime.date(2022,1,1)
+
+    for phrase in ('every other day', '2nd tuesday of every month', 'every weekend', 
+                   '15 - 20 of each month', 'every other feb', 'every monday in 2022 to 2024'):
+        s = f(phrase); s.start_date = start
+        c = s.to_compact()
+        assert( c == lib.CompactSpec.from_phrase(phrase).to_spec(start).to_compact() )
+        assert( c == c.to_spec().to_compact() and ( c.start_date == start or c.anchor == None ) )
+        assert( c == pickle.loads(pickle.dumps(c)) )
+        assert( c.next_occurances(start_date=start, max_results=20) == s.next_occurances(max_results=20) )
+        assert( c.to_spec(start_date=start).previous_occurances(max_results=20) == 
+                s.previous_occurances(max_results=20) )
+
+    c = lib.CompactSpec(dow={0,4}, dom={1,31}, month_indx=2)
+    assert( c.dow_mask == 0b10001 and c.dom_mask == (1 << 30) | 1 and c.month_mask == 0b10 )
+    assert( c.dow == {0,4} and c.month_indx == 2 and c.month_mod == None )
+    assert( lib.CompactSpec(month_mod=2, month_mod_val=1).month_mask == 0b010101010101 )
+
+    # immutable, hashable and without an instance dictionary
+    d = { c: 1, lib.CompactSpec(dow={4,0}, dom={31,1}, month_indx=2): 2 }
+    assert( len(d) == 1 and not hasattr(c, '__dict__') )
+    with pytest.raises(AttributeError):
+        c.dow_mask = 1
+
+    # the engines accept it directly
+    c = lib.CompactSpec.from_phrase('every monday')
+    assert( c.to_cycle().period_years == 400 )
+    assert( lib.occurrences_between(c, start, datetime.date(2022,1,31), as_array=False) == 
+            c.next_occurances(start_date=start, end_date=datetime.date(2022,1,31)) )
+
+    with pytest.raises(ValueError):
+        lib.CompactSpec(dom={32})
+
+    # the day modulus keeps its anchor, the filters share one compiled form
+    c = lib.CompactSpec(day_mod=2, start_date=start)
+    assert( c.anchor == start.toordinal() and c.start_date == start )
+    assert( c.contains(datetime.date(2022,1,3)) and not c.contains(datetime.date(2022,1,4)) )
+    assert( c != lib.CompactSpec(day_mod=2) and lib.CompactSpec(day_mod=1).anchor == None )
+    assert( c.compile() is lib.CompactSpec(day_mod=2).compile() )
+
+def test_interval_set():
+    from semsched.intervals import IntervalSet
+
+    s = IntervalSet({1,2,3,7,9,10})
+    assert( s.intervals == ((1,3), (7,7), (9,10)) and len(s) == 6 )
+    assert( s == {1,2,3,7,9,10} and hash(s) == hash(frozenset(s)) )
+    assert( 7 in s and 8 not in s and 0 not in s and 11 not in s )
+    assert( list(s.irange(2, 9)) == [2,3,7,9] and list(s.irange(2, 9, reverse=True)) == [9,7,3,2] )
+    assert( IntervalSet.from_intervals([(5,8), (1,2), (3,4)]).intervals == ((1,8),) )
+
+    # wide year ranges are a single interval
+    f = lib.DateIntervalSpec.from_phrase
+    s = f('every monday in 2000 to 9000')
+    assert( s.year_indx.intervals == ((2000, 9000),) and len(s.year_indx) == 7001 )
+    assert( (s.year_indx.lower, s.year_indx.upper) == (2000, 9000) )
+    assert( s.next(start_date=datetime.date(2100,1,1)) == datetime.date(2100,1,4) )
+    assert( s.possible_range()[1] == datetime.date(9000,12,29) )
+    assert( f('1st - 7th of feb').dom == set(range(1, 8)) )
+
+    # date literals use the same type
+    for phrase in ('5 Jan 2022', '20220105', 'every monday in 2022'):
+        assert( lib.DateIntervalSpec(phrase).year_indx.intervals == ((2022, 2022),) )
+
+def test_parse_cache():
+    import threading
+
+    assert( lib.normalize_phrase('  Every  Other-Monday!! ') == 'Every Other-Monday!!' )
+
+    cache = lib.ParseCache(maxsize=2)
+    a = cache.get('every monday')
+    assert( cache.get(' every  monday') is a and a.dow == {0} )
+    cache.get('every tuesday'); cache.get('every wednesday')
+    assert( cache.info() == (1, 3, 1, 2, 2) )
+
+    # least recently used is evicted first
+    assert( cache.get('every tuesday') is not None and cache.info().hits == 2 )
+    cache.resize(1)
+    assert( cache.info().evictions == 2 and cache.info().currsize == 1 )
+    cache.clear()
+    assert( cache.info() == (0, 0, 0, 1, 0) )
+
+    # instances have their own filters, the parse result is shared
+    s = lib.DateIntervalSpec.from_phrase('every other  monday')
+    t = lib.DateIntervalSpec.from_phrase('every other monday')
+    assert( s.compile() is t.compile() and s.phrase == 'every other  monday' )
+    t.dow = {1}
+    assert( s.dow == {0} and s.compile() is not t.compile() )
+    assert( lib.CompactSpec.from_phrase('every other monday') == s.to_compact() )
+
+    # the cached result is the same as parsing the phrase
+    for phrase in ('Every Two Weeks', 'First Friday of Feb 2031', 'Fifth day of March', '2022-01-05!'):
+        s, t = lib.DateIntervalSpec.from_phrase(phrase), lib.DateIntervalSpec(phrase)
+        assert( [ getattr(s, x) for x in lib.engine._filter_names ] == 
+                [ getattr(t, x) for x in lib.engine._filter_names ] )
+
+    # concurrent lookups of the same phrases
+    cache = lib.ParseCache(maxsize=8)
+    phrases = [ 'every %s' % d for d in ('monday', 'tuesday', 'friday', 'weekday') ] * 50
+    def _run(): 
+        for p in phrases: cache.get(p)
+    threads = [ threading.Thread(target=_run) for i in range(4) ]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    info = cache.info()
+    assert( info.hits + info.misses == 800 and info.currsize == 4 and info.evictions == 0 )
+
+def test_date_literals():
+    from semsched.parsing import _date_literal
+    f = lib.DateIntervalSpec
+
+    s = f('5 Jan 2022')
+    assert( s.year_indx == {2022} and s.month_indx == 1 and s.dom == {5} )
+    s = f('feb-2023')
+    assert( s.year_indx == {2023} and s.month_indx == 2 and s.dom == None )
+    s = f('25 dec')
+    assert( s.year_indx == None and s.month_indx == 12 and s.dom == {25} )
+
+    # same as strptime, the middle digits of %Y%M%d are minutes
+    assert( _date_literal('20221231') == (2022, 1, 31) )
+    assert( _date_literal('2022015') == (2022, 1, 5) and _date_literal('202205') == (2022, 1, 5) )
+    assert( _date_literal('31apr2022') == None and _date_literal('29feb') == None )
+    assert( _date_literal('everymonday') == None and _date_literal('0000jan') == None )
+
+def test_tokenize():
+    from semsched.parsing import _tokenize
+
+    tokens = [ t for t in _tokenize('every 2nd Tuesday of the months, in 2022') if t[0] != 'sep' ]
+    assert( tokens == [ ('mod', 'every', 'every'), ('num', '2nd', 2), ('day', 'Tuesday', 'tue'), 
+                        ('month', 'months', 'month'), ('num', '2022', 2022.0) ] )
+
+    # separators aren't bounded by words, as before
+    assert( [ t[:2] for t in _tokenize('ninth') ] == [ ('other', 'n'), ('sep', 'in'), ('other', 'th') ] )
+    assert( _tokenize('yearly 2022s')[0][0] == 'year' and _tokenize('2022s')[0][0] == 'year' )
+    assert( _tokenize('second')[0] == ('num', 'second', 2) and _tokenize('Second')[0][0] == 'other' )
+
+def test_alias_lookup():
+    from semsched import defs
+
+    f = defs._spec_alias_lookup
+    assert( f(defs._days, 'Mondays') == 'mon' and f(defs._days, 'tues') == 'tue' )
+    assert( f(defs._months, 'sept') == 'sep' and f(defs._months, 'xyz') == None )
+    assert( f(defs._modifiers, 3) == None )
+
+    # the index follows runtime changes of the alias maps
+    version = defs._days.version
+    defs._days['mon'].add('lundi')
+    try:
+        assert( defs._days.version > version and f(defs._days, 'lundis') == 'mon' )
+        assert( lib.DateIntervalSpec('every lundi').dow == {0} )
+    finally:
+        defs._days['mon'].discard('lundi')
+    assert( f(defs._days, 'lundi') == None )
+
+    # including a merge of new keys
+    aliases = defs._days
+    defs._days |= {'moonday': {'moonday'}}
+    try:
+        assert( defs._days is aliases and f(defs._days, 'moondays') == 'moonday' )
+        assert( isinstance(defs._days['moonday'], defs._AliasSet) )
+    finally:
+        del defs._days['moonday']
+    assert( f(defs._days, 'moonday') == None )
+
+def test_try_words2int():
+    from semsched import numwords
+
+    for val in ('21', '21st', '3RD', 'second', 'thousand', 'twenty one', 'a hundred', 
+                'negative ten', 'and', '1,000', '1e3', 'monday', 'Second', '2022s', ''):
+        try:
+            expected = numwords.words2int(val)
+        except Exception:
+            expected = None
+        result = numwords.try_words2int(val)
+        assert( result == expected and type(result) == type(expected) )
+        # memoized result
+        assert( numwords.try_words2int(val) == expected )
+
+    assert( numwords.try_words2int('twenty one') == 21 and numwords.try_words2int('blue') == None )
+
+def test_startup():
+    from semsched import startup, engine
+    import subprocess
+
+    report = startup.measure_startup('every monday', repeat=1)
+    assert( all( x > 0 for x in report ) )
+
+    # the patterns are compiled on the first parse, not at import
+    code = ( 'import sys, semsched; from semsched import parsing; '
+             'sys.stdout.write(repr((parsing._pattn, parsing._literal_fmts)))' )
+    env = dict(os.environ, PYTHONPATH=os.path.join( os.path.dirname(mypath), 'src' ))
+    assert( subprocess.check_output([sys.executable, '-c', code], env=env).strip() == b'(None, None)' )
+
+    # the year kinds table matches the generated one
+    assert( engine._generate_period_kinds() == engine._cycle_kinds )
+    assert( sum( n for k, n in engine._period_kinds(lib.DateIntervalSpec('every 3 years')) ) == 400 )
+
+def test_parse_many():
+    phrases = ['every monday', ' every  monday', 'every 0 days', 'every other day', 'every monday', None,
+               'first friday of every month', 'every 3 years in 2000 to 2050']
+
+    # the shared parse cache is left alone
+    info = lib.parse_cache.info()
+    lib.parse_many(phrases, workers=1)
+    assert( lib.parse_cache.info() == info )
+
+    for kwargs in ( dict(workers=1), dict(workers=2, chunksize=1) ):
+        results = lib.parse_many(phrases, **kwargs)
+        assert( len(results) == len(phrases) )
+        for phrase, result in zip(phrases, results):
+            try:
+                expected = lib.DateIntervalSpec.from_phrase(phrase)
+            except Exception as e:
+                assert( type(result) == type(e) )
+                continue
+            assert( isinstance(result, lib.DateIntervalSpec) and result.phrase == phrase )
+            assert( result.to_compact() == expected.to_compact() and result.dom == expected.dom )
+
+        # separate instances for repeated phrases
+        assert( results[0] is not results[4] and results[0].dow == results[1].dow == {0} )
+
+    compact = lib.parse_many(phrases, workers=1, compact=True)
+    assert( compact[0] is compact[1] and compact[0] == lib.CompactSpec(day_mod=1, dow={0}) )
+    assert( isinstance(compact[2], ValueError) and isinstance(compact[5], Exception) )
+
+def test_schedule_set():
+    f = lib.DateIntervalSpec.from_phrase
+    specs = {}
+    for i, phrase in enumerate(['every monday', 'every other day', 'every weekday', 'every 15th', 
+                                'first friday of every month', 'every 3 years', 'every day in 2022', 
+                                'every 31st of feb', 'every other weekend', 'every march']):
+        specs[i] = f(phrase)
+        specs[i].start_date = datetime.date(2021, 12, 1 + i)
+    specs['compact'] = lib.CompactSpec(dow={1}, year_indx={2021, 2023})
+
+    schedules = lib.ScheduleSet(specs)
+    del schedules[1]
+    schedules[1] = specs[1]
+    assert( len(schedules) == len(specs) and schedules['compact'] is specs['compact'] )
+
+    for date in ( datetime.date(2021,11,1) + datetime.timedelta(days=k) for k in range(0, 900, 3) ):
+        expected = [ k for k, s in specs.items() if s.contains(date) ]
+        assert( sorted(schedules.matching(date), key=str) == sorted(expected, key=str) )
+
+    # no matching days at all
+    assert( 7 in schedules and 7 not in schedules.matching(datetime.date(2022,2,28)) )
+
+    # the specifications aren't compiled when set, equal filters share one form
+    schedules = lib.ScheduleSet( (i, lib.CompactSpec(dow={i % 2}, day_mod=1 + i % 2)) for i in range(100) )
+    assert( len(schedules._forms) == 2 and all( form[2] == None for form in schedules._forms.values() ) )
+    assert( len(schedules.matching(datetime.date(2022,1,3))) == 50 )
+    schedules.matching(datetime.date(2022,1,4))
+    assert( [ form[2] == None for form in sorted(schedules._forms.values(), key=lambda x: x[0].dow) ] == [True, False] )
+
+def test_timeline():
+    specs = {}
+    for key, phrase in ( ('a', 'every monday'), ('b', 'every other day'), ('c', 'every 15th'), 
+                         ('d', 'every 31st of feb'), ('e', 'every day in 2022') ):
+        specs[key] = lib.DateIntervalSpec.from_phrase(phrase)
+        specs[key].start_date = datetime.date(2021,12,20)
+
+    start, end = datetime.date(2021,12,1), datetime.date(2022,3,1)
+    events = list( lib.iter_timeline(specs, start_date=start, end_date=end) )
+
+    expected = []
+    for i, (key, spec) in enumerate(specs.items()):
+        expected.extend( (d, i, key) for d in spec.iter_occurrences(start_date=start, end_date=end) )
+    assert( events == [ (d, key) for d, i, key in sorted(expected) ] )
+
+    # lazy, the cursors start from the start date of each specification
+    events = list( itertools.islice(lib.iter_timeline(list(specs.values())), 50) )
+    expected = []
+    for i, spec in enumerate(specs.values()):
+        expected.extend( (d, i) for d in spec.next_occurances(max_results=50) )
+    assert( events == sorted(expected)[:50] and events[0][0] > datetime.date(2021,12,20) )
+
+def test_scheduler():
+    import asyncio
+    from semsched.scheduler import Scheduler
+
+    class FakeClock(object):
+        def __init__(self, now):
+            self.current = now
+            self.sleeps = []
+        def now(self):
+            return self.current
+        async def sleep(self, seconds):
+            self.sleeps.append(seconds)
+            self.current += datetime.timedelta(seconds=seconds)
+            await asyncio.sleep(0)
+
+    clock = FakeClock( datetime.datetime(2022,1,3,10,30) )
+    scheduler = Scheduler(clock=clock)
+    fired = []
+
+    def on_fire(key, date):
+        fired.append( (key, date, clock.now()) )
+        if len(fired) == 3: scheduler.remove('daily')
+        if len(fired) == 4: scheduler.add('late', every_day, on_fire)
+        if len(fired) == 8: scheduler.stop()
+
+    async def on_fire_async(key, date):
+        on_fire(key, date)
+
+    monday = lib.DateIntervalSpec.from_phrase('every monday')
+    other = lib.DateIntervalSpec.from_phrase('every other day')
+    every_day = lib.DateIntervalSpec.from_phrase('every day')
+    monday.start_date = every_day.start_date = datetime.date(2022,1,1)
+    other.start_date = datetime.date(2021,12,31)
+
+    # today's 9:00 monday is past, the next is a week later
+    assert( scheduler.add('monday', monday, on_fire, at=datetime.time(9)) == datetime.datetime(2022,1,10,9) )
+    scheduler.add('daily', other, on_fire_async)
+    scheduler.add('never', lib.CompactSpec(dom={30}, month_indx=2), on_fire)
+    assert( len(scheduler) == 2 and scheduler.next_fire() == (datetime.datetime(2022,1,4), 'daily') )
+
+    asyncio.run( asyncio.wait_for(scheduler.run(), 5) )
+
+    # every callback runs exactly at its fire time, without polling
+    assert( [ (k, d) for k, d, t in fired ] == [
+        ('daily', datetime.date(2022,1,4)), ('daily', datetime.date(2022,1,6)), ('daily', datetime.date(2022,1,8)),
+        ('monday', datetime.date(2022,1,10)), ('late', datetime.date(2022,1,11)), ('late', datetime.date(2022,1,12)),
+        ('late', datetime.date(2022,1,13)), ('late', datetime.date(2022,1,14)) ] )
+    assert( all( t == datetime.datetime.combine(d, datetime.time(9 if k == 'monday' else 0)) for k, d, t in fired ) )
+    assert( len(clock.sleeps) <= 2 * len(fired) and 'daily' not in scheduler )
+
+def test_thread_safety():
+    import threading, copy
+
+    phrases = ['every other day', 'every other monday', 'every 3rd weekday', 'every other weekend', 
+               'every 2nd friday of every month', 'every day in 2022', 'every 3 days']
+    start = datetime.date(2022,3,15)
+    shared = []
+    for phrase in phrases:
+        s = lib.DateIntervalSpec.from_phrase(phrase)
+        s.start_date = start
+        shared.extend([ s, s.to_compact() ])
+
+    def queries(s, k):
+        day = start + datetime.timedelta(days=37 * k)
+        return ( s.next(), s.previous(), s.next_occurances(start_date=day, max_results=5), 
+                 s.previous_occurances(end_date=day, max_results=5), s.nth_occurrence(k + 1), 
+                 s.count_occurrences(start, day), s.contains(day), 
+                 list(itertools.islice(s.iter_previous_occurrences(end_date=day), 3)) )
+
+    # results of private copies, evaluated one at a time
+    expected = [ [ queries(copy.deepcopy(s), k) for k in range(8) ] for s in shared ]
+    state = [ dict( (n, getattr(s, n)) for n in ('day_mod', 'day_mod_val', 'dow', 'start_date') ) for s in shared ]
+
+    errors = []
+    def worker(seed):
+        try:
+            for r in range(20):
+                i = ( seed + r ) % len(shared)
+                k = ( seed * 3 + r ) % 8
+                if queries(shared[i], k) != expected[i][k]: errors.append( (i, k) )
+                lib.DateIntervalSpec(phrases[r % len(phrases)])
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [ threading.Thread(target=worker, args=(i,)) for i in range(8) ]
+        for t in threads: t.start()
+        for t in threads: t.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert( errors == [] )
+
+    # the queries don't modify the specifications, even when they raise
+    with pytest.raises(Exception):
+        shared[0].previous_occurances(end_date='not a date')
+    assert( state == [ dict( (n, getattr(s, n)) for n in ('day_mod', 'day_mod_val', 'dow', 'start_date') ) for s in shared ] )